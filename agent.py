@@ -16,8 +16,8 @@ DB_DIR = config.DB_DIR
 DOCS_DIR = config.DOCS_DIR
 
 
-def build_agent(rag_history: list[tuple[str, str]]):
-    return build_graph_agent(rag_history)
+def build_agent(checkpointer=None):
+    return build_graph_agent(checkpointer)
 
 
 if __name__ == "__main__":
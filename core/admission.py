@@ -0,0 +1,150 @@
+"""Controle de admissão do servidor: turnos simultâneos limitados, fila justa entre clientes."""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from typing import Any
+
+# Duração assumida para um turno enquanto nenhum terminou (usada no Retry-After).
+DURACAO_TURNO_PADRAO = 30.0
+
+
+class Saturado(Exception):
+    """Requisição recusada: 429 para o cliente acima do limite, 503 para o servidor lotado."""
+
+    def __init__(self, status: int, motivo: str, retry_after: int) -> None:
+        super().__init__(motivo)
+        self.status = status
+        self.motivo = motivo
+        self.retry_after = retry_after
+
+
+@dataclass
+class Vaga:
+    cliente: str
+    inicio: float
+    espera: float  # segundos na fila até a admissão
+
+
+def _percentil(valores: list[float], fracao: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+class ControleAdmissao:
+    """Limita os turnos em execução e enfileira o excedente com justiça entre clientes.
+
+    Cada cliente tem a sua fila; quando uma vaga abre, os clientes são atendidos
+    em rodízio, de modo que um editor que dispara muitas requisições não passa à
+    frente dos demais. Um cliente com `max_por_cliente` turnos pendentes recebe
+    429; com a fila cheia, ou após `espera_maxima` segundos na fila, 503. Deve
+    ser usado sempre a partir do mesmo event loop.
+    """
+
+    def __init__(self, max_em_execucao: int, max_fila: int, max_por_cliente: int, espera_maxima: float) -> None:
+        self.max_em_execucao = max_em_execucao
+        self.max_fila = max_fila
+        self.max_por_cliente = max_por_cliente
+        self.espera_maxima = espera_maxima
+        self._em_execucao = 0
+        self._na_fila = 0
+        self._pendentes: defaultdict[str, int] = defaultdict(int)
+        self._filas: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self._esperas: deque[float] = deque(maxlen=1000)
+        self._duracoes: deque[float] = deque(maxlen=100)
+        self._recusas: Counter[int] = Counter()
+
+    def _retry_after(self) -> int:
+        duracao = sum(self._duracoes) / len(self._duracoes) if self._duracoes else DURACAO_TURNO_PADRAO
+        return max(1, math.ceil(duracao * (self._na_fila + 1) / self.max_em_execucao))
+
+    def _recusar(self, status: int, motivo: str) -> Saturado:
+        self._recusas[status] += 1
+        return Saturado(status, motivo, self._retry_after())
+
+    def _despachar(self) -> None:
+        while self._em_execucao < self.max_em_execucao and self._filas:
+            cliente, fila = next(iter(self._filas.items()))
+            futuro = fila.popleft()
+            if fila:
+                self._filas.move_to_end(cliente)
+            else:
+                del self._filas[cliente]
+            if futuro.done():  # desistiu por tempo ou desconexão
+                continue
+            self._em_execucao += 1
+            futuro.set_result(None)
+
+    def _desistir(self, cliente: str, futuro: asyncio.Future) -> None:
+        if futuro.done() and not futuro.cancelled():
+            # A vaga foi concedida junto com a desistência: devolve-a.
+            self._em_execucao -= 1
+        futuro.cancel()
+        self._liberar_cliente(cliente)
+        self._despachar()
+
+    def _liberar_cliente(self, cliente: str) -> None:
+        self._pendentes[cliente] -= 1
+        if self._pendentes[cliente] <= 0:
+            del self._pendentes[cliente]
+
+    async def entrar(self, cliente: str) -> Vaga:
+        if self._pendentes.get(cliente, 0) >= self.max_por_cliente:
+            raise self._recusar(429, f"limite de {self.max_por_cliente} turnos simultâneos por cliente atingido")
+        chegada = time.monotonic()
+        if self._em_execucao < self.max_em_execucao and not self._filas:
+            self._em_execucao += 1
+            self._pendentes[cliente] += 1
+            self._esperas.append(0.0)
+            return Vaga(cliente, chegada, 0.0)
+        if self._na_fila >= self.max_fila:
+            raise self._recusar(503, f"fila de {self.max_fila} turnos cheia")
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._filas.setdefault(cliente, deque()).append(futuro)
+        self._na_fila += 1
+        self._pendentes[cliente] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(futuro), self.espera_maxima)
+        except asyncio.TimeoutError:
+            self._desistir(cliente, futuro)
+            raise self._recusar(503, f"turno aguardou mais de {self.espera_maxima:g} s na fila") from None
+        except asyncio.CancelledError:
+            self._desistir(cliente, futuro)
+            raise
+        finally:
+            self._na_fila -= 1
+        inicio = time.monotonic()
+        self._esperas.append(inicio - chegada)
+        return Vaga(cliente, inicio, inicio - chegada)
+
+    def sair(self, vaga: Vaga) -> None:
+        self._duracoes.append(time.monotonic() - vaga.inicio)
+        self._em_execucao -= 1
+        self._liberar_cliente(vaga.cliente)
+        self._despachar()
+
+    def estatisticas(self) -> dict[str, Any]:
+        esperas = list(self._esperas)
+        return {
+            "em_execucao": self._em_execucao,
+            "na_fila": self._na_fila,
+            "pendentes_por_cliente": dict(self._pendentes),
+            "espera_fila_ms": {
+                "p50": round(_percentil(esperas, 0.5) * 1000),
+                "p95": round(_percentil(esperas, 0.95) * 1000),
+                "max": round(max(esperas, default=0.0) * 1000),
+            },
+            "recusadas": {"429": self._recusas[429], "503": self._recusas[503]},
+            "limites": {
+                "max_em_execucao": self.max_em_execucao,
+                "max_fila": self.max_fila,
+                "max_por_cliente": self.max_por_cliente,
+                "espera_maxima_s": self.espera_maxima,
+            },
+        }
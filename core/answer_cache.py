@@ -0,0 +1,223 @@
+"""Cache das respostas de `consultar_documentacao`, invalidado pelas fontes que cada resposta usou."""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from . import config
+from .ingestion import EstadoIndice
+
+
+def normalizar_pergunta(pergunta: str) -> str:
+    texto = unicodedata.normalize("NFKC", pergunta).casefold()
+    texto = re.sub(r"\s+", " ", texto)
+    return texto.strip(" ?!.;:")
+
+
+def impressao_recuperacao(retriever: BaseRetriever, modo: str = "") -> str:
+    """Resume a configuração de recuperação; respostas só são reaproveitadas se ela não mudou."""
+    vector_store = retriever.vectorstore
+    embeddings = getattr(vector_store, "embeddings", None)
+    dados = {
+        "modo": modo,
+        "tipo_busca": retriever.search_type,
+        "parametros": retriever.search_kwargs,
+        "colecao": getattr(getattr(vector_store, "_collection", None), "name", None),
+        "modelo": getattr(embeddings, "modelo", None) or getattr(embeddings, "model", None),
+        # Trocar o modelo de resposta não deve continuar servindo as respostas do anterior.
+        "modelo_resposta": config.MODEL_RAG_ANSWER,
+    }
+    serializado = json.dumps(dados, sort_keys=True, default=str)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()[:16]
+
+
+class CacheRespostas:
+    """Guarda respostas por (pergunta normalizada, impressão da recuperação).
+
+    Cada resposta registra o hash, no manifesto, das fontes em que se baseou e
+    deixa de valer quando alguma delas muda ou sai da base, ou quando uma
+    fonte nova entra na base depois dela (o documento novo pode responder
+    melhor). Editar outros arquivos já indexados não a afeta. Respostas sem
+    fontes (nada encontrado) valem só na revisão em que foram geradas.
+
+    Com `limiar_similaridade`, perguntas diferentes cujo embedding tenha
+    similaridade de cosseno acima do limiar com uma pergunta já respondida
+    também reaproveitam a resposta.
+    """
+
+    def __init__(
+        self,
+        caminho: Path,
+        impressao: str,
+        max_itens: int,
+        embeddings: Embeddings | None = None,
+        limiar_similaridade: float | None = None,
+    ) -> None:
+        self.impressao = impressao
+        self.max_itens = max_itens
+        self.embeddings = embeddings
+        self.limiar_similaridade = limiar_similaridade if embeddings is not None else None
+        self.acertos = 0
+        self.faltas = 0
+        self._lock = threading.Lock()
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._conexao = sqlite3.connect(str(caminho), timeout=30, check_same_thread=False)
+        with self._conexao:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            colunas = {linha[1] for linha in self._conexao.execute("PRAGMA table_info(respostas)")}
+            if colunas and "fontes" not in colunas:
+                # Formato anterior, invalidado por revisão inteira: é só cache, recomeça vazio.
+                self._conexao.execute("DROP TABLE respostas")
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                " chave TEXT PRIMARY KEY,"
+                " impressao TEXT NOT NULL,"
+                " revisao INTEGER NOT NULL,"
+                " fontes TEXT NOT NULL,"
+                " pergunta TEXT NOT NULL,"
+                " vetor BLOB,"
+                " resposta TEXT NOT NULL,"
+                " ultimo_acesso REAL NOT NULL)"
+            )
+            self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_respostas_impressao ON respostas (impressao)")
+
+    def _chave(self, pergunta: str) -> str:
+        return hashlib.sha256(f"{self.impressao}\0{pergunta}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _valida(fontes: str, revisao_gravada: int, estado: EstadoIndice) -> bool:
+        if revisao_gravada < estado.revisao_ultima_adicao:
+            return False
+        gravadas: dict[str, str | None] = json.loads(fontes)
+        if not gravadas:
+            return revisao_gravada == estado.revisao
+        return all(
+            fonte in estado.hashes and estado.hashes[fonte] == hash_ for fonte, hash_ in gravadas.items()
+        )
+
+    def _descartar(self, chaves: list[str]) -> None:
+        # Chamado com o lock adquirido.
+        if chaves:
+            with self._conexao:
+                self._conexao.executemany("DELETE FROM respostas WHERE chave = ?", [(chave,) for chave in chaves])
+
+    def _buscar_semelhante(self, vetor: list[float], estado: EstadoIndice) -> tuple[str, str] | None:
+        linhas = []
+        obsoletas = []
+        for chave, fontes, revisao_gravada, blob, resposta in self._conexao.execute(
+            "SELECT chave, fontes, revisao, vetor, resposta FROM respostas"
+            " WHERE impressao = ? AND vetor IS NOT NULL",
+            (self.impressao,),
+        ):
+            if self._valida(fontes, revisao_gravada, estado):
+                linhas.append((chave, blob, resposta))
+            else:
+                obsoletas.append(chave)
+        self._descartar(obsoletas)
+        if not linhas:
+            return None
+        matriz = np.stack([np.frombuffer(linha[1], dtype=np.float32) for linha in linhas])
+        consulta = np.asarray(vetor, dtype=np.float32)
+        normas = np.linalg.norm(matriz, axis=1) * (np.linalg.norm(consulta) or 1.0)
+        similaridades = (matriz @ consulta) / np.where(normas == 0, 1.0, normas)
+        melhor = int(np.argmax(similaridades))
+        if similaridades[melhor] < self.limiar_similaridade:
+            return None
+        return linhas[melhor][0], linhas[melhor][2]
+
+    def obter(self, pergunta: str, estado: EstadoIndice) -> tuple[str | None, list[float] | None]:
+        """Retorna a resposta em cache (ou `None`) e o embedding calculado para a pergunta."""
+        normalizada = normalizar_pergunta(pergunta)
+        chave = self._chave(normalizada)
+        encontrado: tuple[str, str] | None = None
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT fontes, revisao, resposta FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha is not None:
+                if self._valida(linha[0], linha[1], estado):
+                    encontrado = (chave, linha[2])
+                else:
+                    self._descartar([chave])
+        vetor = None
+        if encontrado is None and self.limiar_similaridade is not None:
+            vetor = self.embeddings.embed_query(normalizada)
+            with self._lock:
+                encontrado = self._buscar_semelhante(vetor, estado)
+        with self._lock:
+            if encontrado is None:
+                self.faltas += 1
+                return None, vetor
+            self.acertos += 1
+            with self._conexao:
+                self._conexao.execute(
+                    "UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (time.time(), encontrado[0])
+                )
+        return encontrado[1], vetor
+
+    def gravar(
+        self,
+        pergunta: str,
+        estado: EstadoIndice,
+        resposta: str,
+        fontes: Iterable[str],
+        vetor: list[float] | None = None,
+    ) -> None:
+        """Grava a resposta com o estado da base no início da consulta e o hash de cada fonte usada."""
+        normalizada = normalizar_pergunta(pergunta)
+        if vetor is None and self.limiar_similaridade is not None:
+            vetor = self.embeddings.embed_query(normalizada)
+        blob = array("f", vetor).tobytes() if vetor is not None else None
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO respostas"
+                " (chave, impressao, revisao, fontes, pergunta, vetor, resposta, ultimo_acesso)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._chave(normalizada),
+                    self.impressao,
+                    estado.revisao,
+                    json.dumps({fonte: estado.hashes.get(fonte) for fonte in fontes}, sort_keys=True),
+                    normalizada,
+                    blob,
+                    resposta,
+                    time.time(),
+                ),
+            )
+            self._conexao.execute(
+                "DELETE FROM respostas WHERE chave IN ("
+                " SELECT chave FROM respostas ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?)",
+                (self.max_itens,),
+            )
+
+    def estatisticas(self) -> dict[str, Any]:
+        consultas = self.acertos + self.faltas
+        return {
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "taxa_acerto": (self.acertos / consultas) if consultas else 0.0,
+        }
+
+
+def criar_cache_respostas(retriever: BaseRetriever, modo: str = "") -> CacheRespostas | None:
+    if not config.ANSWER_CACHE_ENABLED:
+        return None
+    return CacheRespostas(
+        config.ANSWER_CACHE_FILE,
+        impressao=impressao_recuperacao(retriever, modo),
+        max_itens=config.ANSWER_CACHE_MAX_ENTRIES,
+        embeddings=getattr(retriever.vectorstore, "embeddings", None),
+        limiar_similaridade=config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    )
@@ -0,0 +1,114 @@
+"""Orçamentos por turno (tempo, tokens e chamadas ao LLM) e a decisão de parada do agente."""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, BaseMessage
+
+# Conteúdo que o create_react_agent devolve quando os passos do grafo acabam
+# antes de o modelo concluir as chamadas de ferramenta.
+MENSAGEM_PASSOS_ESGOTADOS = "Sorry, need more steps to process this request."
+
+
+class OrcamentoEsgotado(RuntimeError):
+    def __init__(self, motivo: str, descricao: str) -> None:
+        super().__init__(descricao)
+        self.motivo = motivo
+        self.descricao = descricao
+
+
+class OrcamentoTurno(BaseCallbackHandler):
+    """Conta tokens e chamadas ao LLM de um turno e interrompe a execução ao esgotar um limite.
+
+    A verificação acontece antes de cada nova chamada ao LLM; a exceção
+    `OrcamentoEsgotado` atravessa o grafo e é tratada em `executar_agente`.
+    """
+
+    raise_error = True
+
+    def __init__(self, max_segundos: int, max_tokens: int, max_chamadas: int) -> None:
+        self.max_segundos = max_segundos
+        self.max_tokens = max_tokens
+        self.max_chamadas = max_chamadas
+        self.inicio = time.monotonic()
+        self.tokens = 0
+        self.chamadas = 0
+
+    @property
+    def decorrido(self) -> float:
+        return time.monotonic() - self.inicio
+
+    def verificar(self) -> OrcamentoEsgotado | None:
+        if self.decorrido >= self.max_segundos:
+            return OrcamentoEsgotado("tempo", f"limite de tempo de {self.max_segundos} s atingido")
+        if self.tokens >= self.max_tokens:
+            return OrcamentoEsgotado("tokens", f"limite de {self.max_tokens} tokens atingido")
+        if self.chamadas >= self.max_chamadas:
+            return OrcamentoEsgotado(
+                "chamadas_llm", f"limite de {self.max_chamadas} chamadas ao LLM atingido"
+            )
+        return None
+
+    def _antes_da_chamada(self) -> None:
+        esgotado = self.verificar()
+        if esgotado is not None:
+            raise esgotado
+        self.chamadas += 1
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: list[list[BaseMessage]], **kwargs: Any) -> None:
+        self._antes_da_chamada()
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], **kwargs: Any) -> None:
+        self._antes_da_chamada()
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        for geracoes in response.generations:
+            for geracao in geracoes:
+                uso = getattr(getattr(geracao, "message", None), "usage_metadata", None)
+                if uso:
+                    self.tokens += uso.get("total_tokens", 0)
+                    return
+        uso = (response.llm_output or {}).get("token_usage") or {}
+        self.tokens += uso.get("total_tokens", 0)
+
+
+@dataclass(frozen=True)
+class DecisaoParada:
+    encerrar: bool
+    motivo: str
+    descricao: str = ""
+
+
+def melhor_resposta(mensagens: list[BaseMessage]) -> AIMessage | None:
+    """Última resposta do agente com texto, ignorando pedidos de ferramenta e o aviso de passos."""
+    for mensagem in reversed(mensagens):
+        if (
+            isinstance(mensagem, AIMessage)
+            and mensagem.text.strip()
+            and not mensagem.tool_calls
+            and mensagem.text != MENSAGEM_PASSOS_ESGOTADOS
+        ):
+            return mensagem
+    return None
+
+
+def decidir_parada(
+    mensagens: list[BaseMessage],
+    orcamento: OrcamentoTurno,
+    iteracao: int,
+    max_iteracoes: int,
+    interrompido: OrcamentoEsgotado | None = None,
+) -> DecisaoParada:
+    if interrompido is None:
+        interrompido = orcamento.verificar()
+    if interrompido is not None:
+        return DecisaoParada(True, interrompido.motivo, interrompido.descricao)
+    ultima = next((m for m in reversed(mensagens) if isinstance(m, AIMessage)), None)
+    if ultima is not None and melhor_resposta([ultima]) is not None:
+        return DecisaoParada(True, "resposta_final")
+    if iteracao >= max_iteracoes:
+        return DecisaoParada(True, "iteracoes", f"limite de {max_iteracoes} iterações atingido")
+    return DecisaoParada(False, "passos_esgotados")
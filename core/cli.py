@@ -1,7 +1,11 @@
 import sys
 
 from . import config, documentation
+from .live_index import iniciar_indexacao_em_segundo_plano
+from .metrics import formatar_tabela
 from .rag_agent import build_graph_agent
+from .sessions import abrir_checkpointer, config_sessao, estado_da_sessao
+from .streaming import TextoTransmitido
 from .utils import (
     anexar_registro_tasks,
     registrar_arquivos_alterados_resumido,
@@ -19,6 +23,7 @@ CONTEXT_FIELDS = [
     "implementado_frontend",
     "endpoints_backend",
     "regras_negocio",
+    "resumo_conversa",
 ]
 
 def _verificar_documentacao_projetos() -> None:
@@ -60,16 +65,30 @@ def run():
         print("Base vetorial não encontrada. Execute `python ingest.py` primeiro.")
         sys.exit(1)
 
-    rag_history: list[tuple[str, str]] = []
-    graph_app = build_graph_agent(rag_history)
-    history: list = []
-    
-    ## context_state = {key: None for key in CONTEXT_FIELDS}
-    ## carrega as decisoes registra em decisoes_arquitetura.md
-    context_state = carregar_contexto_de_docs() 
+    graph_app = build_graph_agent(abrir_checkpointer())
+    sessao = config.SESSIONS_CLI_ID
+    salvo = estado_da_sessao(graph_app, sessao) if config.SESSIONS_ENABLED else {}
+    if salvo:
+        # Sessão existente: histórico, resumo e contexto vêm do checkpoint.
+        history: list = salvo.get("history") or []
+        context_state = {key: salvo.get(key) for key in CONTEXT_FIELDS}
+        print(f"[Sessão] Retomando a sessão '{sessao}' ({len(history)} mensagens).")
+    else:
+        history = []
+        ## carrega as decisoes registra em decisoes_arquitetura.md
+        context_state = carregar_contexto_de_docs()
 
     print("Agente RAG Certidão Imobiliária – digite 'sair' para encerrar.")
 
+    indexador = iniciar_indexacao_em_segundo_plano()
+    try:
+        _conversar(graph_app, history, context_state, sessao)
+    finally:
+        if indexador is not None:
+            indexador.parar()
+
+
+def _conversar(graph_app, history: list, context_state: dict, sessao: str) -> None:
     while True:
         config.ALTERACOES_ATUAIS.clear()
         pergunta = input("Você: ").strip()
@@ -86,10 +105,31 @@ def run():
             "__contador__": 0,
             **context_state,
         }
-        novo_estado = graph_app.invoke(estado_inicial, config={"recursion_limit": 100})
+        transmitido = TextoTransmitido()
+
+        def ao_evento(evento: dict) -> None:
+            if evento["tipo"] == "tool_inicio":
+                print(f"\n[Agente] Executando tool '{evento['nome']}'...", flush=True)
+            if evento["tipo"] != "token":
+                return
+            if evento["execucao"] != transmitido.execucao:
+                print("\nAgente: ", end="", flush=True)
+            transmitido.registrar(evento)
+            print(evento["conteudo"], end="", flush=True)
+
+        novo_estado = graph_app.invoke(
+            estado_inicial,
+            config={"recursion_limit": 100, **config_sessao(sessao, ao_evento=ao_evento)},
+        )
         answer = novo_estado["answer"]
 
-        print(f"Agente: {answer}\n")
+        restante = transmitido.restante(answer)
+        if restante is None:
+            print(f"\nAgente: {answer}\n")
+        else:
+            print(f"{restante}\n")
+        if novo_estado.get("metricas"):
+            print(formatar_tabela(novo_estado["metricas"]) + "\n", flush=True)
 
         anexar_registro_tasks(pergunta, answer)
         arquivos_alterados = sorted(config.ALTERACOES_ATUAIS)
@@ -194,12 +194,284 @@ PROJECT_DOCS_DIR = DOCS_DIR / "projetos"
 MAX_ARQUIVO_CARACTERES = 15000
 ALTERACOES_ATUAIS: set[str] = set()
 
+# pastas que queremos ignorar em QUALQUER ponto do caminho ao varrer os projetos
+IGNORAR_DIRS = {"node_modules", "modules", ".git", "dist", "build", "__pycache__"}
+
 AGENT_MAX_ITERATIONS = _require_positive_int(_AGENT_LIMITS, "maxIterations")
 AGENT_MAX_EXECUTION_TIME = _require_positive_int(
     _AGENT_LIMITS, "maxExecutionTime"
 )
 
 
+def _optional_config_section(section: str) -> dict[str, Any]:
+    value = AGENT_CONFIG.get(section)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise RuntimeError(
+            f"Esperado um objeto para '{section}' em '{CONFIG_PATH}', mas foi recebido {type(value).__name__}."
+        )
+    return value
+
+
+def _optional_positive_int(
+    config_section: dict[str, Any], section: str, field: str, padrao: int
+) -> int:
+    value = config_section.get(field)
+    if value is None:
+        return padrao
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise RuntimeError(
+            f"O campo '{field}' em '{section}' deve ser um inteiro positivo em '{CONFIG_PATH}'."
+        )
+    return value
+
+
+def _optional_str(config_section: dict[str, Any], section: str, field: str) -> str | None:
+    value = config_section.get(field)
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        raise RuntimeError(
+            f"O campo '{field}' em '{section}' deve ser uma string em '{CONFIG_PATH}'."
+        )
+    return value
+
+
+AGENT_MAX_TOKENS_PER_TURN = _optional_positive_int(
+    _AGENT_LIMITS, "agentLimits", "maxTokensPerTurn", 200_000
+)
+AGENT_MAX_LLM_CALLS_PER_TURN = _optional_positive_int(
+    _AGENT_LIMITS, "agentLimits", "maxLlmCallsPerTurn", 40
+)
+
+_INGESTION = _optional_config_section("ingestion")
+
+INGESTION_BATCH_SIZE = _optional_positive_int(_INGESTION, "ingestion", "batchSize", 64)
+INGESTION_MAX_WORKERS = _optional_positive_int(_INGESTION, "ingestion", "maxWorkers", 4)
+INGESTION_REQUESTS_PER_MINUTE = _optional_positive_int(
+    _INGESTION, "ingestion", "requestsPerMinute", 3000
+)
+INGESTION_TOKENS_PER_MINUTE = _optional_positive_int(
+    _INGESTION, "ingestion", "tokensPerMinute", 1_000_000
+)
+INGESTION_MAX_RETRIES = _optional_positive_int(_INGESTION, "ingestion", "maxRetries", 6)
+INGESTION_MAX_FILE_BYTES = _optional_positive_int(
+    _INGESTION, "ingestion", "maxFileBytes", 20 * 1024 * 1024
+)
+INGESTION_MAX_MEMORY_MB = _optional_positive_int(_INGESTION, "ingestion", "maxMemoryMb", 256)
+INGESTION_PROCESS_WORKERS = _optional_positive_int(
+    _INGESTION, "ingestion", "processWorkers", os.cpu_count() or 1
+)
+
+
+def _optional_bool(config_section: dict[str, Any], section: str, field: str, padrao: bool) -> bool:
+    value = config_section.get(field)
+    if value is None:
+        return padrao
+    if not isinstance(value, bool):
+        raise RuntimeError(
+            f"O campo '{field}' em '{section}' deve ser true ou false em '{CONFIG_PATH}'."
+        )
+    return value
+
+
+_EMBEDDING_CACHE = _optional_config_section("embeddingCache")
+
+EMBEDDING_CACHE_ENABLED = _optional_bool(_EMBEDDING_CACHE, "embeddingCache", "enabled", True)
+EMBEDDING_CACHE_MAX_ENTRIES = _optional_positive_int(
+    _EMBEDDING_CACHE, "embeddingCache", "maxEntries", 200_000
+)
+EMBEDDING_CACHE_FILE = DB_DIR / "embeddings_cache.sqlite"
+EMBEDDINGS_BASE_URL = os.getenv("OPENAI_EMBEDDINGS_BASE_URL") or _optional_str(
+    _INGESTION, "ingestion", "embeddingsBaseUrl"
+)
+
+
+def _optional_positive_float(
+    config_section: dict[str, Any], section: str, field: str, padrao: float
+) -> float:
+    value = config_section.get(field)
+    if value is None:
+        return padrao
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+        raise RuntimeError(
+            f"O campo '{field}' em '{section}' deve ser um número positivo em '{CONFIG_PATH}'."
+        )
+    return float(value)
+
+
+_LIVE_INDEX = _optional_config_section("liveIndex")
+
+LIVE_INDEX_ENABLED = _optional_bool(_LIVE_INDEX, "liveIndex", "enabled", True)
+LIVE_INDEX_DEBOUNCE_SECONDS = _optional_positive_float(
+    _LIVE_INDEX, "liveIndex", "debounceSeconds", 1.5
+)
+LIVE_INDEX_WATCH_FILESYSTEM = _optional_bool(_LIVE_INDEX, "liveIndex", "watchFilesystem", True)
+
+
+_ANSWER_CACHE = _optional_config_section("answerCache")
+
+ANSWER_CACHE_ENABLED = _optional_bool(_ANSWER_CACHE, "answerCache", "enabled", True)
+ANSWER_CACHE_MAX_ENTRIES = _optional_positive_int(_ANSWER_CACHE, "answerCache", "maxEntries", 1000)
+ANSWER_CACHE_SIMILARITY_THRESHOLD: float | None = None
+if _ANSWER_CACHE.get("similarityThreshold") is not None:
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = _optional_positive_float(
+        _ANSWER_CACHE, "answerCache", "similarityThreshold", 1.0
+    )
+    if ANSWER_CACHE_SIMILARITY_THRESHOLD > 1:
+        raise RuntimeError(
+            f"O campo 'similarityThreshold' em 'answerCache' deve estar entre 0 e 1 em '{CONFIG_PATH}'."
+        )
+ANSWER_CACHE_FILE = DB_DIR / "respostas_cache.sqlite"
+
+
+_HYBRID_SEARCH = _optional_config_section("hybridSearch")
+
+HYBRID_SEARCH_ENABLED = _optional_bool(_HYBRID_SEARCH, "hybridSearch", "enabled", True)
+HYBRID_SEARCH_CANDIDATES = _optional_positive_int(_HYBRID_SEARCH, "hybridSearch", "candidates", 20)
+HYBRID_SEARCH_RRF_K = _optional_positive_int(_HYBRID_SEARCH, "hybridSearch", "rrfK", 60)
+HYBRID_SEARCH_LEXICAL_FAST_PATH = _optional_bool(
+    _HYBRID_SEARCH, "hybridSearch", "lexicalFastPath", True
+)
+LEXICAL_INDEX_FILE = DB_DIR / "indice_lexico.sqlite"
+
+
+def _optional_choice(
+    config_section: dict[str, Any], section: str, field: str, opcoes: tuple[str, ...], padrao: str
+) -> str:
+    value = config_section.get(field)
+    if value is None:
+        return padrao
+    if value not in opcoes:
+        raise RuntimeError(
+            f"O campo '{field}' em '{section}' deve ser um de {', '.join(opcoes)} em '{CONFIG_PATH}'."
+        )
+    return value
+
+
+RAG_MODOS = ("conversacional", "direta", "trechos")
+
+_RAG = _optional_config_section("rag")
+
+RAG_MODE = _optional_choice(_RAG, "rag", "mode", RAG_MODOS, "conversacional")
+RAG_MAX_CHUNK_CHARACTERS = _optional_positive_int(_RAG, "rag", "maxChunkCharacters", 1500)
+
+
+_MEMORY = _optional_config_section("memory")
+
+MEMORY_MAX_HISTORY_TOKENS = _optional_positive_int(_MEMORY, "memory", "maxHistoryTokens", 4000)
+MEMORY_RECENT_TURNS = _optional_positive_int(_MEMORY, "memory", "recentTurns", 2)
+MEMORY_SUMMARY_MAX_TOKENS = _optional_positive_int(_MEMORY, "memory", "summaryMaxTokens", 600)
+MEMORY_RAG_HISTORY_TURNS = _optional_positive_int(_MEMORY, "memory", "ragHistoryTurns", 4)
+
+
+LLM_CACHE_MODOS = ("off", "read-write", "replay")
+
+_LLM_CACHE = _optional_config_section("llmCache")
+
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE") or _optional_choice(
+    _LLM_CACHE, "llmCache", "mode", LLM_CACHE_MODOS, "off"
+)
+if LLM_CACHE_MODE not in LLM_CACHE_MODOS:
+    raise RuntimeError(
+        f"LLM_CACHE_MODE deve ser um de {', '.join(LLM_CACHE_MODOS)} (recebido '{LLM_CACHE_MODE}')."
+    )
+LLM_CACHE_FILE = _path_from_env(
+    os.getenv("LLM_CACHE_FILE") or _optional_str(_LLM_CACHE, "llmCache", "file")
+) or DB_DIR / "llm_cache.sqlite"
+
+
+_METRICS = _optional_config_section("metrics")
+
+METRICS_ENABLED = _optional_bool(_METRICS, "metrics", "enabled", True)
+# Fora de docs/, pelo mesmo motivo do rastreamento: docs/ é ingerido e observado pela indexação.
+METRICS_FILE = _path_from_env(_optional_str(_METRICS, "metrics", "file")) or DB_DIR / "metricas.jsonl"
+
+
+_TRACING = _optional_config_section("tracing")
+
+TRACING_LEVEL = (os.getenv("AGENT_TRACE_LEVEL") or _optional_choice(
+    _TRACING, "tracing", "level", ("DEBUG", "INFO", "WARNING", "ERROR", "OFF"), "INFO"
+)).upper()
+if TRACING_LEVEL not in ("DEBUG", "INFO", "WARNING", "ERROR", "OFF"):
+    raise RuntimeError(
+        f"AGENT_TRACE_LEVEL deve ser DEBUG, INFO, WARNING, ERROR ou OFF (recebido '{TRACING_LEVEL}')."
+    )
+# Fora de docs/: o rastreamento não deve ser ingerido na base RAG nem disparar a indexação em segundo plano.
+TRACING_FILE = _path_from_env(_optional_str(_TRACING, "tracing", "file")) or DB_DIR / "rastreamento.jsonl"
+TRACING_MAX_PAYLOAD_CHARACTERS = _optional_positive_int(
+    _TRACING, "tracing", "maxPayloadCharacters", 2000
+)
+TRACING_SAMPLE_RATE = _optional_positive_float(_TRACING, "tracing", "sampleRate", 1.0)
+if TRACING_SAMPLE_RATE > 1:
+    raise RuntimeError(f"O campo 'sampleRate' em 'tracing' deve estar entre 0 e 1 em '{CONFIG_PATH}'.")
+# Visão detalhada no terminal (prompts, respostas e saídas das tools); desligada por padrão.
+TRACING_CONSOLE = os.getenv("AGENT_TRACE_CONSOLE", "").lower() in {"1", "true", "sim"} or _optional_bool(
+    _TRACING, "tracing", "console", False
+)
+
+
+_MODELS = _optional_config_section("models")
+
+# Cada papel usa o modelo configurado em `models`; sem ele, vale OPENAI_MODEL.
+MODEL_DEFAULT = os.getenv("OPENAI_MODEL") or "gpt-4o-mini"
+MODEL_AGENT = _optional_str(_MODELS, "models", "agent") or MODEL_DEFAULT
+MODEL_RAG_ANSWER = _optional_str(_MODELS, "models", "ragAnswer") or MODEL_DEFAULT
+MODEL_CONDENSE_QUESTION = _optional_str(_MODELS, "models", "condenseQuestion") or MODEL_DEFAULT
+MODEL_SUMMARY = _optional_str(_MODELS, "models", "summary") or MODEL_DEFAULT
+
+_MODEL_ROUTER = _MODELS.get("router") or {}
+if not isinstance(_MODEL_ROUTER, dict):
+    raise RuntimeError(f"Esperado um objeto para 'models.router' em '{CONFIG_PATH}'.")
+MODEL_ROUTER_ENABLED = _optional_bool(_MODEL_ROUTER, "models.router", "enabled", False)
+MODEL_ROUTER_FAST_MODEL = _optional_str(_MODEL_ROUTER, "models.router", "fastModel") or "gpt-4o-mini"
+MODEL_ROUTER_MAX_QUESTION_CHARACTERS = _optional_positive_int(
+    _MODEL_ROUTER, "models.router", "maxQuestionCharacters", 80
+)
+
+
+_SESSIONS = _optional_config_section("sessions")
+
+SESSIONS_ENABLED = _optional_bool(_SESSIONS, "sessions", "enabled", True)
+SESSIONS_FILE = _path_from_env(_optional_str(_SESSIONS, "sessions", "file")) or DB_DIR / "sessoes.sqlite"
+# Sessão retomada pela CLI; AGENT_SESSION_ID permite manter várias conversas separadas.
+SESSIONS_CLI_ID = os.getenv("AGENT_SESSION_ID") or _optional_str(_SESSIONS, "sessions", "cliSessionId") or "cli"
+
+
+_SERVER = _optional_config_section("server")
+
+SERVER_MAX_CONCURRENT_TURNS = _optional_positive_int(_SERVER, "server", "maxConcurrentTurns", 4)
+SERVER_MAX_QUEUED_TURNS = _optional_positive_int(_SERVER, "server", "maxQueuedTurns", 16)
+SERVER_MAX_TURNS_PER_CLIENT = _optional_positive_int(_SERVER, "server", "maxTurnsPerClient", 2)
+SERVER_MAX_QUEUE_WAIT_SECONDS = _optional_positive_float(_SERVER, "server", "maxQueueWaitSeconds", 120.0)
+
+
+_FILE_INDEX = _optional_config_section("fileIndex")
+
+# Intervalo mínimo entre duas verificações de mtime dos diretórios de um projeto.
+FILE_INDEX_REFRESH_SECONDS = _optional_positive_float(_FILE_INDEX, "fileIndex", "refreshSeconds", 2.0)
+FILE_INDEX_DIR = DB_DIR / "indice_nomes"
+
+
+_CONTENT_SEARCH = _optional_config_section("contentSearch")
+
+CONTENT_SEARCH_MAX_RESULTS = _optional_positive_int(_CONTENT_SEARCH, "contentSearch", "maxResults", 50)
+CONTENT_SEARCH_MAX_FILE_BYTES = _optional_positive_int(
+    _CONTENT_SEARCH, "contentSearch", "maxFileBytes", 1024 * 1024
+)
+# A partir de quantos arquivos fora do índice a varredura usa o pool de processos.
+CONTENT_SEARCH_PROCESS_POOL_MIN_FILES = _optional_positive_int(
+    _CONTENT_SEARCH, "contentSearch", "processPoolMinFiles", 500
+)
+CONTENT_INDEX_DIR = DB_DIR / "indice_conteudo"
+
+
+_READ_CACHE = _optional_config_section("readCache")
+
+READ_CACHE_ENABLED = _optional_bool(_READ_CACHE, "readCache", "enabled", True)
+
+
 def format_context_descriptions() -> str:
     linhas: list[str] = []
     for contexto in sorted(CONTEXT_DESCRIPTIONS.keys()):
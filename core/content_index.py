@@ -0,0 +1,243 @@
+"""Busca de texto no conteúdo dos projetos, apoiada em um índice de trigramas persistente.
+
+Cada projeto de `PROJECT_PATHS` tem um banco SQLite com uma tabela FTS5
+(tokenizador `trigram`) que guarda o texto de cada arquivo. Um termo com pelo
+menos três caracteres é procurado primeiro no índice, que devolve só os
+arquivos candidatos. Os arquivos novos ou alterados desde a última busca são
+varridos diretamente — em um pool de processos quando são muitos, como na
+primeira busca de um projeto — e gravados no índice em seguida. Arquivos
+maiores que `maxFileBytes` não entram no índice: são varridos a cada busca,
+via mmap, em blocos terminados em quebra de linha.
+"""
+from __future__ import annotations
+
+import mmap
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import config
+from .file_index import indice_nomes
+from .file_reader import TAMANHO_BLOCO, _decodificar
+
+INDICE_VERSAO = 2  # 2: texto decodificado como em `ler_arquivo` (utf-8 ou cp1252)
+TAMANHO_TRIGRAMA = 3
+MAX_CARACTERES_TRECHO = 200
+_AMOSTRA_BINARIO = 8192
+
+Ocorrencia = tuple[int, str]  # (número da linha, trecho)
+
+
+def _linhas_com(texto: str, termo: str) -> list[Ocorrencia]:
+    """Linhas de `texto` que contêm `termo` (já em minúsculas)."""
+    if termo not in texto.lower():
+        return []
+    # Só "\n" separa linhas, como em `ler_arquivo`: os números batem com os de lá.
+    return [
+        (numero, linha.strip()[:MAX_CARACTERES_TRECHO])
+        for numero, linha in enumerate(texto.split("\n"), start=1)
+        if termo in linha.lower()
+    ]
+
+
+def _varrer_arquivo(tarefa: tuple[str, str, int]) -> tuple[str | None, list[Ocorrencia]]:
+    """Lê um arquivo fora do índice e procura o termo. Roda também no pool de processos.
+
+    Devolve o texto (None para arquivos binários, grandes demais ou ilegíveis)
+    para que ele seja gravado no índice.
+    """
+    caminho, termo, max_bytes = tarefa
+    try:
+        if os.path.getsize(caminho) > max_bytes:
+            return None, []  # varrido por `_varrer_grande` a cada busca
+        with open(caminho, "rb") as arquivo:
+            dados = arquivo.read(max_bytes + 1)
+    except OSError:
+        return None, []
+    if len(dados) > max_bytes or b"\0" in dados[:_AMOSTRA_BINARIO]:
+        return None, []
+    texto, _ = _decodificar(dados)
+    return texto, _linhas_com(texto, termo)
+
+
+def _varrer_grande(caminho: Path, termo: str, limite: int) -> list[Ocorrencia]:
+    """Procura o termo em um arquivo acima do limite do índice, sem carregá-lo inteiro."""
+    ocorrencias: list[Ocorrencia] = []
+    try:
+        with open(caminho, "rb") as arquivo, mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if b"\0" in mm[:_AMOSTRA_BINARIO]:
+                return []
+            tamanho = len(mm)
+            inicio = 0
+            linhas_antes = 0
+            while inicio < tamanho and len(ocorrencias) < limite:
+                quebra = mm.find(b"\n", min(inicio + TAMANHO_BLOCO, tamanho))
+                fim = tamanho if quebra == -1 else quebra + 1
+                bloco = mm[inicio:fim]
+                texto, _ = _decodificar(bloco.removesuffix(b"\n"))
+                ocorrencias.extend(
+                    (linhas_antes + numero, trecho) for numero, trecho in _linhas_com(texto, termo)
+                )
+                linhas_antes += bloco.count(b"\n")
+                inicio = fim
+    except (OSError, ValueError):
+        return []
+    return ocorrencias[:limite]
+
+
+class IndiceConteudo:
+    """Índice de trigramas do conteúdo de um projeto, atualizado a cada busca pelo mtime e tamanho."""
+
+    def __init__(self, raiz: Path, caminho: Path) -> None:
+        self.raiz = raiz
+        self._lock = threading.Lock()
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._conexao = sqlite3.connect(str(caminho), timeout=30, check_same_thread=False)
+        with self._conexao:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            if self._conexao.execute("PRAGMA user_version").fetchone()[0] != INDICE_VERSAO:
+                self._conexao.execute("DROP TABLE IF EXISTS arquivos")
+                self._conexao.execute("DROP TABLE IF EXISTS conteudo")
+                self._conexao.execute(f"PRAGMA user_version = {INDICE_VERSAO}")
+            # Arquivos binários ou grandes demais ficam só em `arquivos`, para não serem relidos.
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS arquivos ("
+                " id INTEGER PRIMARY KEY,"
+                " caminho TEXT NOT NULL UNIQUE,"
+                " mtime_ns INTEGER NOT NULL,"
+                " tamanho INTEGER NOT NULL)"
+            )
+            self._conexao.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS conteudo USING fts5(texto, tokenize='trigram')"
+            )
+
+    def _pendentes(self, arquivos: list[str]) -> tuple[list[tuple[str, int, int]], list[int]]:
+        """Arquivos novos ou alterados (com mtime e tamanho atuais) e ids de arquivos removidos."""
+        indexados = {
+            caminho: (id_, mtime, tamanho)
+            for id_, caminho, mtime, tamanho in self._conexao.execute(
+                "SELECT id, caminho, mtime_ns, tamanho FROM arquivos"
+            )
+        }
+        pendentes: list[tuple[str, int, int]] = []
+        for relativo in arquivos:
+            try:
+                estado = os.stat(self.raiz / relativo)
+            except OSError:
+                continue
+            registro = indexados.pop(relativo, None)
+            if registro is None or registro[1:] != (estado.st_mtime_ns, estado.st_size):
+                pendentes.append((relativo, estado.st_mtime_ns, estado.st_size))
+        return pendentes, [id_ for id_, _, _ in indexados.values()]
+
+    def _varrer_pendentes(
+        self, pendentes: list[tuple[str, int, int]], termo: str
+    ) -> list[tuple[str | None, list[Ocorrencia]]]:
+        tarefas = [
+            (str(self.raiz / relativo), termo, config.CONTENT_SEARCH_MAX_FILE_BYTES)
+            for relativo, _, _ in pendentes
+        ]
+        if len(tarefas) < config.CONTENT_SEARCH_PROCESS_POOL_MIN_FILES or config.INGESTION_PROCESS_WORKERS <= 1:
+            return [_varrer_arquivo(tarefa) for tarefa in tarefas]
+        # "spawn", como na ingestão: não herda as threads do agente por fork.
+        with ProcessPoolExecutor(
+            max_workers=config.INGESTION_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            return list(executor.map(_varrer_arquivo, tarefas, chunksize=32))
+
+    def _gravar(
+        self,
+        pendentes: list[tuple[str, int, int]],
+        textos: list[str | None],
+        removidos: list[int],
+    ) -> None:
+        with self._conexao:
+            ids = removidos + [
+                linha[0]
+                for relativo, _, _ in pendentes
+                for linha in self._conexao.execute("SELECT id FROM arquivos WHERE caminho = ?", (relativo,))
+            ]
+            self._conexao.executemany("DELETE FROM conteudo WHERE rowid = ?", [(id_,) for id_ in ids])
+            self._conexao.executemany("DELETE FROM arquivos WHERE id = ?", [(id_,) for id_ in ids])
+            for (relativo, mtime, tamanho), texto in zip(pendentes, textos):
+                cursor = self._conexao.execute(
+                    "INSERT INTO arquivos (caminho, mtime_ns, tamanho) VALUES (?, ?, ?)",
+                    (relativo, mtime, tamanho),
+                )
+                if texto is not None:
+                    self._conexao.execute(
+                        "INSERT INTO conteudo (rowid, texto) VALUES (?, ?)", (cursor.lastrowid, texto)
+                    )
+
+    def _candidatos(self, termo: str) -> dict[str, int]:
+        """Arquivos indexados que podem conter `termo`, com o rowid do texto."""
+        if len(termo) < TAMANHO_TRIGRAMA:
+            # Termos curtos não formam trigramas: todo o texto indexado é varrido.
+            linhas = self._conexao.execute(
+                "SELECT a.caminho, a.id FROM arquivos a JOIN conteudo c ON c.rowid = a.id"
+            )
+        else:
+            linhas = self._conexao.execute(
+                "SELECT a.caminho, a.id FROM conteudo c JOIN arquivos a ON a.id = c.rowid"
+                " WHERE conteudo MATCH ?",
+                ('"' + termo.replace('"', '""') + '"',),
+            )
+        return dict(linhas.fetchall())
+
+    def _grandes(self) -> set[str]:
+        """Arquivos acima de `maxFileBytes`, guardados no índice sem o texto."""
+        return {
+            caminho
+            for (caminho,) in self._conexao.execute(
+                "SELECT caminho FROM arquivos WHERE tamanho > ?", (config.CONTENT_SEARCH_MAX_FILE_BYTES,)
+            )
+        }
+
+    def _texto(self, id_: int) -> str:
+        return self._conexao.execute("SELECT texto FROM conteudo WHERE rowid = ?", (id_,)).fetchone()[0]
+
+    def buscar(self, termo: str, limite: int) -> tuple[list[str], bool]:
+        """Linhas `caminho:linha: trecho` que contêm `termo` (sem diferenciar maiúsculas), até `limite`."""
+        termo = termo.lower()
+        arquivos = indice_nomes(self.raiz).listar()
+        resultados: list[str] = []
+        with self._lock:
+            pendentes, removidos = self._pendentes(arquivos)
+            varridos = self._varrer_pendentes(pendentes, termo)
+            self._gravar(pendentes, [texto for texto, _ in varridos], removidos)
+            # Os pendentes já foram varridos; o índice só lê os demais candidatos.
+            ja_varridos = {
+                relativo: ocorrencias for (relativo, _, _), (_, ocorrencias) in zip(pendentes, varridos)
+            }
+            candidatos = self._candidatos(termo)
+            grandes = self._grandes()
+            for relativo in arquivos:
+                if relativo in grandes:
+                    ocorrencias = _varrer_grande(self.raiz / relativo, termo, limite - len(resultados))
+                elif relativo in ja_varridos:
+                    ocorrencias = ja_varridos[relativo]
+                elif relativo in candidatos:
+                    ocorrencias = _linhas_com(self._texto(candidatos[relativo]), termo)
+                else:
+                    continue
+                for numero, trecho in ocorrencias:
+                    resultados.append(f"{self.raiz / relativo}:{numero}: {trecho}")
+                    if len(resultados) >= limite:
+                        return resultados, True
+        return resultados, False
+
+
+_INDICES: dict[str, IndiceConteudo] = {}
+_INDICES_LOCK = threading.Lock()
+
+
+def indice_conteudo(projeto: str, raiz: Path) -> IndiceConteudo:
+    with _INDICES_LOCK:
+        indice = _INDICES.get(projeto)
+        if indice is None or indice.raiz != raiz:
+            indice = IndiceConteudo(raiz, config.CONTENT_INDEX_DIR / f"{projeto}.sqlite")
+            _INDICES[projeto] = indice
+        return indice
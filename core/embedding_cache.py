@@ -0,0 +1,161 @@
+"""Cache persistente de embeddings compartilhado por ingestão e consultas."""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from . import config
+
+
+class CachedEmbeddings(Embeddings):
+    """Consulta um SQLite indexado por (endpoint, modelo, hash do texto) antes de chamar a API.
+
+    Os vetores ficam gravados como float32 e o cache é limitado a `max_itens`
+    entradas; ao exceder o limite, as menos usadas recentemente são removidas.
+    """
+
+    def __init__(
+        self, base: Embeddings, modelo: str, caminho: Path, max_itens: int, endpoint: str | None = None
+    ) -> None:
+        self.base = base
+        self.modelo = modelo
+        # Outro provedor pode servir um modelo de mesmo nome com vetores diferentes.
+        # Sem endpoint próprio as chaves são as de antes, e o cache existente continua valendo.
+        self._prefixo = f"{endpoint}\0{modelo}" if endpoint else modelo
+        self.max_itens = max_itens
+        self.acertos = 0
+        self.faltas = 0
+        self._lock = threading.Lock()
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._conexao = sqlite3.connect(str(caminho), timeout=30, check_same_thread=False)
+        with self._conexao:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " chave TEXT PRIMARY KEY,"
+                " vetor BLOB NOT NULL,"
+                " ultimo_acesso REAL NOT NULL)"
+            )
+            self._conexao.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_acesso ON embeddings (ultimo_acesso)"
+            )
+
+    def _chave(self, texto: str) -> str:
+        return hashlib.sha256(f"{self._prefixo}\0{texto}".encode("utf-8")).hexdigest()
+
+    def _buscar(self, chaves: list[str]) -> dict[str, list[float]]:
+        encontrados: dict[str, list[float]] = {}
+        unicas = list(dict.fromkeys(chaves))
+        with self._lock, self._conexao:
+            for inicio in range(0, len(unicas), 500):
+                parte = unicas[inicio : inicio + 500]
+                marcadores = ",".join("?" * len(parte))
+                for chave, vetor in self._conexao.execute(
+                    f"SELECT chave, vetor FROM embeddings WHERE chave IN ({marcadores})", parte
+                ):
+                    encontrados[chave] = array("f", vetor).tolist()
+            if encontrados:
+                agora = time.time()
+                self._conexao.executemany(
+                    "UPDATE embeddings SET ultimo_acesso = ? WHERE chave = ?",
+                    [(agora, chave) for chave in encontrados],
+                )
+        return encontrados
+
+    def _gravar(self, itens: dict[str, list[float]]) -> None:
+        agora = time.time()
+        with self._lock, self._conexao:
+            self._conexao.executemany(
+                "INSERT OR IGNORE INTO embeddings (chave, vetor, ultimo_acesso) VALUES (?, ?, ?)",
+                [(chave, array("f", vetor).tobytes(), agora) for chave, vetor in itens.items()],
+            )
+            # Contado na mesma transação: CLI, servidor e ingestão gravam no mesmo arquivo.
+            total = self._conexao.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            excedente = total - self.max_itens
+            if excedente > 0:
+                self._conexao.execute(
+                    "DELETE FROM embeddings WHERE chave IN ("
+                    " SELECT chave FROM embeddings ORDER BY ultimo_acesso LIMIT ?)",
+                    (excedente,),
+                )
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        chaves = [self._chave(texto) for texto in texts]
+        encontrados = self._buscar(chaves)
+        pendentes: dict[str, str] = {}
+        for chave, texto in zip(chaves, texts):
+            if chave not in encontrados:
+                pendentes.setdefault(chave, texto)
+        acertos = sum(1 for chave in chaves if chave in encontrados)
+        with self._lock:
+            self.acertos += acertos
+            self.faltas += len(texts) - acertos
+        if pendentes:
+            vetores = self.base.embed_documents(list(pendentes.values()))
+            novos = dict(zip(pendentes.keys(), vetores))
+            self._gravar(novos)
+            encontrados.update(novos)
+        return [encontrados[chave] for chave in chaves]
+
+    def embed_query(self, text: str) -> list[float]:
+        chave = self._chave(text)
+        encontrado = self._buscar([chave]).get(chave)
+        if encontrado is not None:
+            with self._lock:
+                self.acertos += 1
+            return encontrado
+        with self._lock:
+            self.faltas += 1
+        vetor = self.base.embed_query(text)
+        self._gravar({chave: vetor})
+        return vetor
+
+    def estatisticas(self) -> dict[str, Any]:
+        consultas = self.acertos + self.faltas
+        with self._lock:
+            entradas = self._conexao.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "taxa_acerto": (self.acertos / consultas) if consultas else 0.0,
+            "entradas": entradas,
+        }
+
+    def formatar_estatisticas(self) -> str:
+        dados = self.estatisticas()
+        return (
+            f"Cache de embeddings: {dados['acertos']} acertos, {dados['faltas']} faltas "
+            f"({dados['taxa_acerto']:.0%}), {dados['entradas']} entradas armazenadas."
+        )
+
+
+def criar_openai_embeddings(**parametros: Any) -> OpenAIEmbeddings:
+    # Ingestão e consultas precisam usar o mesmo endpoint para que os vetores sejam comparáveis.
+    if config.EMBEDDINGS_BASE_URL:
+        parametros.setdefault("base_url", config.EMBEDDINGS_BASE_URL)
+    return OpenAIEmbeddings(**parametros)
+
+
+def envolver_com_cache(base: Embeddings, modelo: str) -> Embeddings:
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return base
+    return CachedEmbeddings(
+        base,
+        modelo=modelo,
+        caminho=config.EMBEDDING_CACHE_FILE,
+        max_itens=config.EMBEDDING_CACHE_MAX_ENTRIES,
+        endpoint=config.EMBEDDINGS_BASE_URL,
+    )
+
+
+def criar_embeddings_consulta() -> Embeddings:
+    base = criar_openai_embeddings()
+    return envolver_com_cache(base, base.model)
@@ -0,0 +1,212 @@
+"""Etapa de embeddings da ingestão: lotes, concorrência e controle de rate limit."""
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+import openai
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from . import config
+from .embedding_cache import criar_openai_embeddings, envolver_com_cache
+from .tracing import registrar_evento
+
+ERROS_TRANSITORIOS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class TokenBucket:
+    """Balde de tokens thread-safe; `adquirir` bloqueia até haver saldo."""
+
+    def __init__(self, capacidade: float, por_segundo: float) -> None:
+        self.capacidade = capacidade
+        self.por_segundo = por_segundo
+        self._saldo = capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reabastecer(self) -> None:
+        agora = time.monotonic()
+        self._saldo = min(self.capacidade, self._saldo + (agora - self._ultimo) * self.por_segundo)
+        self._ultimo = agora
+
+    def adquirir(self, quantidade: float = 1.0) -> None:
+        # Pedidos maiores que o balde inteiro esperariam para sempre.
+        quantidade = min(quantidade, self.capacidade)
+        while True:
+            with self._lock:
+                self._reabastecer()
+                if self._saldo >= quantidade:
+                    self._saldo -= quantidade
+                    return
+                espera = (quantidade - self._saldo) / self.por_segundo
+            time.sleep(espera)
+
+
+def _estimar_tokens(textos: list[str]) -> int:
+    return sum(len(texto) // 4 + 1 for texto in textos)
+
+
+def _retry_after(exc: Exception) -> float | None:
+    resposta = getattr(exc, "response", None)
+    if resposta is None:
+        return None
+    valor = resposta.headers.get("retry-after")
+    try:
+        return float(valor) if valor else None
+    except ValueError:
+        return None
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """Aplica os limites de requisições/tokens por minuto e refaz chamadas com backoff."""
+
+    def __init__(
+        self,
+        base: Embeddings,
+        requisicoes_por_minuto: int,
+        tokens_por_minuto: int,
+        max_tentativas: int,
+    ) -> None:
+        self.base = base
+        self.max_tentativas = max_tentativas
+        self._requisicoes = TokenBucket(requisicoes_por_minuto, requisicoes_por_minuto / 60)
+        self._tokens = TokenBucket(tokens_por_minuto, tokens_por_minuto / 60)
+
+    def _chamar(self, funcao: Callable[[], Any], textos: list[str]) -> Any:
+        tentativa = 0
+        while True:
+            self._requisicoes.adquirir()
+            self._tokens.adquirir(_estimar_tokens(textos))
+            try:
+                return funcao()
+            except ERROS_TRANSITORIOS as exc:
+                tentativa += 1
+                if tentativa >= self.max_tentativas:
+                    raise
+                espera = _retry_after(exc) or min(60.0, 2 ** tentativa) + random.uniform(0, 1)
+                registrar_evento(
+                    logging.WARNING,
+                    "embeddings_nova_tentativa",
+                    erro=type(exc).__name__,
+                    tentativa=f"{tentativa}/{self.max_tentativas - 1}",
+                    espera_s=round(espera, 1),
+                )
+                time.sleep(espera)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._chamar(lambda: self.base.embed_documents(texts), texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._chamar(lambda: self.base.embed_query(text), [text])
+
+
+def criar_embeddings_ingestao() -> Embeddings:
+    # As novas tentativas ficam por conta do RateLimitedEmbeddings, que respeita o balde;
+    # o cache fica por fora para que acertos não consumam o limite de requisições.
+    base = criar_openai_embeddings(max_retries=0)
+    limitado = RateLimitedEmbeddings(
+        base,
+        requisicoes_por_minuto=config.INGESTION_REQUESTS_PER_MINUTE,
+        tokens_por_minuto=config.INGESTION_TOKENS_PER_MINUTE,
+        max_tentativas=config.INGESTION_MAX_RETRIES,
+    )
+    return envolver_com_cache(limitado, base.model)
+
+
+LoteChunks = list[tuple[str, Document]]
+
+
+class BatchWriter:
+    """Agrupa chunks em lotes e grava cada lote no vector store em paralelo.
+
+    Um lote é despachado ao atingir `tamanho_lote` chunks ou `max_bytes_lote`
+    bytes de texto, e no máximo `2 * max_workers` lotes ficam em voo.
+
+    Cada lote é embutido e persistido por um worker (`add_documents` faz o upsert
+    por id), então o que já foi gravado sobrevive a uma interrupção. O callback
+    `ao_gravar` roda na thread chamadora, na ordem em que os lotes terminam,
+    e é o ponto para atualizar o manifesto de forma progressiva.
+    """
+
+    def __init__(
+        self,
+        vector_store: Any,
+        tamanho_lote: int,
+        max_workers: int,
+        ao_gravar: Callable[[LoteChunks], None],
+        max_bytes_lote: int | None = None,
+    ) -> None:
+        self.vector_store = vector_store
+        self.tamanho_lote = tamanho_lote
+        self.max_workers = max_workers
+        self.ao_gravar = ao_gravar
+        self.max_bytes_lote = max_bytes_lote
+        self._buffer: LoteChunks = []
+        self._bytes_buffer = 0
+        self._pendentes: dict[Future, LoteChunks] = {}
+        self._executor: ThreadPoolExecutor | None = None
+
+    def __enter__(self) -> "BatchWriter":
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="ingestao"
+        )
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        assert self._executor is not None
+        try:
+            if exc_type is None:
+                self._enviar_buffer()
+                self._coletar(todos=True)
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            # Após uma falha, registra os lotes que ainda assim foram gravados.
+            for futuro, lote in list(self._pendentes.items()):
+                if not futuro.cancelled() and futuro.exception() is None:
+                    self.ao_gravar(lote)
+            self._pendentes.clear()
+
+    def adicionar(self, chunk_id: str, documento: Document) -> None:
+        self._buffer.append((chunk_id, documento))
+        self._bytes_buffer += len(documento.page_content.encode("utf-8"))
+        if len(self._buffer) >= self.tamanho_lote or (
+            self.max_bytes_lote is not None and self._bytes_buffer >= self.max_bytes_lote
+        ):
+            self._enviar_buffer()
+
+    def _gravar(self, lote: LoteChunks) -> None:
+        self.vector_store.add_documents(
+            [documento for _, documento in lote], ids=[chunk_id for chunk_id, _ in lote]
+        )
+
+    def _enviar_buffer(self) -> None:
+        if not self._buffer:
+            return
+        assert self._executor is not None, "BatchWriter deve ser usado como context manager."
+        lote, self._buffer = self._buffer, []
+        self._bytes_buffer = 0
+        # Limita os lotes em voo para não acumular memória enquanto a API está lenta.
+        if len(self._pendentes) >= self.max_workers * 2:
+            self._coletar(todos=False)
+        self._pendentes[self._executor.submit(self._gravar, lote)] = lote
+
+    def _coletar(self, todos: bool) -> None:
+        while self._pendentes:
+            concluidos, _ = wait(list(self._pendentes), return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                lote = self._pendentes.pop(futuro)
+                futuro.result()
+                self.ao_gravar(lote)
+            if not todos:
+                return
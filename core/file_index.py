@@ -0,0 +1,177 @@
+"""Índice persistente dos nomes de arquivo de cada projeto, usado por `buscar_arquivos`.
+
+Para cada diretório guardamos o mtime e a lista de arquivos e subdiretórios.
+Criar, remover ou renomear uma entrada altera o mtime do diretório que a
+contém; assim, a atualização só precisa de um `stat` por diretório e relista
+apenas os que mudaram. As pastas de `IGNORAR_DIRS` nunca são percorridas.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from . import config
+from .utils import OUVINTES_ALTERACAO
+
+INDICE_VERSAO = 1
+
+
+class IndiceNomesArquivos:
+    def __init__(self, raiz: Path, caminho: Path, intervalo_atualizacao: float) -> None:
+        self.raiz = raiz
+        self.caminho = caminho
+        self.intervalo_atualizacao = intervalo_atualizacao
+        self._lock = threading.Lock()
+        # diretório relativo -> (mtime_ns, arquivos, subdiretórios)
+        self._diretorios: dict[str, tuple[int, list[str], list[str]]] = self._carregar()
+        # (nome em minúsculas, caminho relativo), na ordem de percurso
+        self._arquivos: list[tuple[str, str]] = []
+        self._atualizado_em: float | None = None
+        self._sujo = True
+
+    def _carregar(self) -> dict[str, tuple[int, list[str], list[str]]]:
+        try:
+            dados = json.loads(self.caminho.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if dados.get("versao") != INDICE_VERSAO or dados.get("raiz") != str(self.raiz):
+            return {}
+        return {rel: (mtime, arquivos, subdirs) for rel, (mtime, arquivos, subdirs) in dados["diretorios"].items()}
+
+    def _salvar(self) -> None:
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self.caminho.with_suffix(".tmp")
+        dados = {"versao": INDICE_VERSAO, "raiz": str(self.raiz), "diretorios": self._diretorios}
+        temporario.write_text(json.dumps(dados, ensure_ascii=False), encoding="utf-8")
+        temporario.replace(self.caminho)
+
+    def _listar(self, diretorio: Path) -> tuple[list[str], list[str]]:
+        arquivos: list[str] = []
+        subdirs: list[str] = []
+        try:
+            with os.scandir(diretorio) as entradas:
+                for entrada in entradas:
+                    try:
+                        if entrada.is_dir(follow_symlinks=False):
+                            if entrada.name not in config.IGNORAR_DIRS:
+                                subdirs.append(entrada.name)
+                        elif entrada.is_file():
+                            arquivos.append(entrada.name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return sorted(arquivos), sorted(subdirs)
+
+    def _atualizar(self) -> None:
+        novos: dict[str, tuple[int, list[str], list[str]]] = {}
+        alterado = False
+        pendentes = [""]
+        while pendentes:
+            relativo = pendentes.pop()
+            try:
+                mtime = os.stat(self.raiz / relativo).st_mtime_ns
+            except OSError:
+                alterado = True
+                continue
+            salvo = self._diretorios.get(relativo)
+            if salvo is not None and salvo[0] == mtime:
+                novos[relativo] = salvo
+            else:
+                alterado = True
+                novos[relativo] = (mtime, *self._listar(self.raiz / relativo))
+            subdirs = novos[relativo][2]
+            pendentes.extend(os.path.join(relativo, nome) for nome in reversed(subdirs))
+        # Subdiretórios removidos somem de `novos` sem alterar `alterado`.
+        alterado = alterado or novos.keys() != self._diretorios.keys()
+        if alterado or self._atualizado_em is None:
+            self._diretorios = novos
+            self._arquivos = [
+                (nome.lower(), os.path.join(relativo, nome))
+                for relativo, (_, arquivos, _) in novos.items()
+                for nome in arquivos
+            ]
+        if alterado:
+            self._salvar()
+
+    def marcar_alteracao(self) -> None:
+        self._sujo = True
+
+    def _arquivos_atualizados(self) -> list[tuple[str, str]]:
+        with self._lock:
+            agora = time.monotonic()
+            if (
+                self._sujo
+                or self._atualizado_em is None
+                or agora - self._atualizado_em >= self.intervalo_atualizacao
+            ):
+                self._sujo = False
+                self._atualizar()
+                self._atualizado_em = agora
+            return self._arquivos
+
+    def listar(self) -> list[str]:
+        """Caminhos relativos de todos os arquivos do projeto, na ordem de percurso."""
+        return [relativo for _, relativo in self._arquivos_atualizados()]
+
+    def buscar(self, filtro: str, limite: int) -> tuple[list[str], bool]:
+        """Arquivos cujo nome contém `filtro` (sem diferenciar maiúsculas), até `limite`."""
+        return self.buscar_varios([filtro], limite)[0]
+
+    def buscar_varios(self, filtros: list[str], limite: int) -> list[tuple[list[str], bool]]:
+        """Resultado de `buscar` para cada filtro, calculado em uma única passada pelo índice.
+
+        Uma alternância compilada com `re` descarta de uma vez os nomes que não
+        contêm nenhum dos filtros; só os que passam são testados filtro a filtro.
+        """
+        arquivos = self._arquivos_atualizados()
+        algum_filtro = re.compile("|".join(re.escape(filtro) for filtro in dict.fromkeys(filtros)))
+        resultados: list[list[str]] = [[] for _ in filtros]
+        pendentes = list(range(len(filtros)))  # filtros abaixo do limite
+        for nome, relativo in arquivos:
+            if not algum_filtro.search(nome):
+                continue
+            caminho = str(self.raiz / relativo)
+            for posicao in [p for p in pendentes if filtros[p] in nome]:
+                resultados[posicao].append(caminho)
+                if len(resultados[posicao]) >= limite:
+                    pendentes.remove(posicao)
+            if not pendentes:
+                break
+        return [(encontrados, len(encontrados) >= limite) for encontrados in resultados]
+
+
+_INDICES: dict[Path, IndiceNomesArquivos] = {}
+_INDICES_LOCK = threading.Lock()
+
+
+def indice_nomes(raiz: Path) -> IndiceNomesArquivos:
+    with _INDICES_LOCK:
+        indice = _INDICES.get(raiz)
+        if indice is None:
+            nome = hashlib.sha1(str(raiz).encode("utf-8")).hexdigest()[:16]
+            indice = IndiceNomesArquivos(
+                raiz,
+                config.FILE_INDEX_DIR / f"{nome}.json",
+                config.FILE_INDEX_REFRESH_SECONDS,
+            )
+            _INDICES[raiz] = indice
+        return indice
+
+
+def _marcar_alteracao(caminho: Path) -> None:
+    # Arquivos escritos pelo agente aparecem na próxima busca, sem esperar o intervalo.
+    caminho = caminho.resolve()
+    with _INDICES_LOCK:
+        indices = list(_INDICES.values())
+    for indice in indices:
+        if caminho.is_relative_to(indice.raiz):
+            indice.marcar_alteracao()
+
+
+OUVINTES_ALTERACAO.append(_marcar_alteracao)
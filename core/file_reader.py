@@ -0,0 +1,201 @@
+"""Leitura paginada de arquivos via mmap, usada por `ler_arquivo`.
+
+Só o trecho pedido é decodificado. Para localizar uma linha sem percorrer o
+arquivo inteiro a cada página, cada versão do arquivo (mtime e tamanho) tem
+um mapa com a quantidade de quebras de linha antes de cada bloco de 1 MB,
+contadas em C com `bytes.count`; a busca final fica restrita a um bloco.
+"""
+from __future__ import annotations
+
+import hashlib
+import mmap
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+TAMANHO_BLOCO = 1 << 20
+MAX_MAPAS = 32
+_AMOSTRA_BINARIO = 8192
+
+
+class LeituraInvalidaError(ValueError):
+    """Intervalo, token de continuação ou arquivo que não pode ser lido."""
+
+
+@dataclass
+class Trecho:
+    texto: str
+    linha_inicial: int
+    linha_final: int
+    total_linhas: int
+    byte_inicial: int
+    byte_final: int  # exclusivo
+    tamanho: int
+    codificacao: str
+    continuacao: str | None  # token para a página seguinte, se houver
+
+    @property
+    def arquivo_inteiro(self) -> bool:
+        return self.byte_inicial == 0 and self.byte_final == self.tamanho
+
+
+@dataclass
+class _MapaLinhas:
+    total_linhas: int
+    quebras_antes_do_bloco: list[int]
+
+
+_MAPAS: OrderedDict[tuple[str, int, int], _MapaLinhas] = OrderedDict()
+_MAPAS_LOCK = threading.Lock()
+
+
+def _versao(mtime_ns: int, tamanho: int) -> str:
+    return hashlib.sha1(f"{mtime_ns}:{tamanho}".encode()).hexdigest()[:8]
+
+
+def _mapa_linhas(chave: tuple[str, int, int], mm: mmap.mmap) -> _MapaLinhas:
+    with _MAPAS_LOCK:
+        mapa = _MAPAS.get(chave)
+        if mapa is not None:
+            _MAPAS.move_to_end(chave)
+            return mapa
+    tamanho = len(mm)
+    quebras: list[int] = []
+    total = 0
+    for inicio in range(0, tamanho, TAMANHO_BLOCO):
+        quebras.append(total)
+        total += mm[inicio : inicio + TAMANHO_BLOCO].count(b"\n")
+    if tamanho and mm[tamanho - 1] != ord("\n"):
+        total += 1  # última linha sem quebra
+    mapa = _MapaLinhas(total, quebras)
+    with _MAPAS_LOCK:
+        _MAPAS[chave] = mapa
+        while len(_MAPAS) > MAX_MAPAS:
+            _MAPAS.popitem(last=False)
+    return mapa
+
+
+def _inicio_da_linha(mm: mmap.mmap, mapa: _MapaLinhas, linha: int) -> int:
+    """Byte em que começa `linha` (1 = primeira): logo após a (linha - 1)-ésima quebra."""
+    alvo = linha - 1
+    if alvo == 0:
+        return 0
+    bloco = bisect_left(mapa.quebras_antes_do_bloco, alvo) - 1
+    posicao = bloco * TAMANHO_BLOCO
+    for _ in range(alvo - mapa.quebras_antes_do_bloco[bloco]):
+        posicao = mm.find(b"\n", posicao) + 1
+    return posicao
+
+
+def _linha_do_byte(mm: mmap.mmap, mapa: _MapaLinhas, posicao: int) -> int:
+    bloco = posicao // TAMANHO_BLOCO
+    inicio_bloco = bloco * TAMANHO_BLOCO
+    return mapa.quebras_antes_do_bloco[bloco] + mm[inicio_bloco:posicao].count(b"\n") + 1
+
+
+def _fronteira_utf8(mm: mmap.mmap, posicao: int, minimo: int) -> int:
+    # Não corta um caractere multibyte ao meio (bytes de continuação são 10xxxxxx).
+    for _ in range(3):
+        if posicao <= minimo or mm[posicao] & 0xC0 != 0x80:
+            break
+        posicao -= 1
+    return posicao
+
+
+def _decodificar(dados: bytes) -> tuple[str, str]:
+    try:
+        return dados.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        # Fontes legados (SQL/PLSQL, JSP) costumam estar em Windows-1252.
+        return dados.decode("cp1252", errors="replace"), "cp1252"
+
+
+def _parse_continuacao(token: str, versao: str) -> tuple[int, int]:
+    try:
+        byte, linha, versao_token = token.strip().split(":")
+        posicao, numero = int(byte), int(linha)
+    except ValueError:
+        raise LeituraInvalidaError(f"token de continuação inválido: '{token}'.") from None
+    if versao_token != versao:
+        raise LeituraInvalidaError(
+            "o arquivo foi alterado desde a página anterior; leia novamente informando linha_inicial."
+        )
+    return posicao, numero
+
+
+def ler_trecho(
+    caminho: Path,
+    max_bytes: int,
+    linha_inicial: int | None = None,
+    quantidade_linhas: int | None = None,
+    byte_inicial: int | None = None,
+    continuacao: str | None = None,
+) -> Trecho:
+    """Lê até `max_bytes` a partir da linha, do byte ou do token de continuação pedido."""
+    if quantidade_linhas is not None and quantidade_linhas < 1:
+        raise LeituraInvalidaError("quantidade_linhas deve ser maior que zero.")
+    if linha_inicial is not None and linha_inicial < 1:
+        # As linhas começam em 1; zero não é tratado como "início do arquivo".
+        raise LeituraInvalidaError(f"linha_inicial inválida: {linha_inicial} (a primeira linha é 1).")
+    estado = caminho.stat()
+    tamanho = estado.st_size
+    versao = _versao(estado.st_mtime_ns, tamanho)
+    if tamanho == 0:
+        if (linha_inicial is not None and linha_inicial > 1) or byte_inicial:
+            raise LeituraInvalidaError("o arquivo está vazio.")
+        return Trecho("", 1, 0, 0, 0, 0, 0, "utf-8", None)
+
+    with open(caminho, "rb") as arquivo, mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if b"\0" in mm[:_AMOSTRA_BINARIO]:
+            raise LeituraInvalidaError("o arquivo parece ser binário.")
+        mapa = _mapa_linhas((str(caminho), estado.st_mtime_ns, tamanho), mm)
+
+        if continuacao:
+            inicio, linha = _parse_continuacao(continuacao, versao)
+            if not 0 <= inicio < tamanho:
+                raise LeituraInvalidaError("não há mais conteúdo após este token de continuação.")
+        elif byte_inicial is not None:
+            if not 0 <= byte_inicial < tamanho:
+                raise LeituraInvalidaError(f"byte_inicial deve estar entre 0 e {tamanho - 1}.")
+            inicio = _fronteira_utf8(mm, byte_inicial, 0)
+            linha = _linha_do_byte(mm, mapa, inicio)
+        else:
+            linha = 1 if linha_inicial is None else linha_inicial
+            if not 1 <= linha <= mapa.total_linhas:
+                raise LeituraInvalidaError(f"linha_inicial deve estar entre 1 e {mapa.total_linhas}.")
+            inicio = _inicio_da_linha(mm, mapa, linha)
+
+        fim = inicio
+        lidas = 0
+        limite = min(tamanho, inicio + max_bytes)
+        while fim < tamanho and (quantidade_linhas is None or lidas < quantidade_linhas):
+            quebra = mm.find(b"\n", fim, limite)
+            if quebra != -1:
+                fim = quebra + 1
+                lidas += 1
+                continue
+            if limite == tamanho:
+                fim = tamanho
+                lidas += 1
+            elif lidas == 0:
+                # Linha maior que a página (JS minificado, dumps): corta dentro dela.
+                fim = _fronteira_utf8(mm, limite, inicio + 1)
+            break
+        texto, codificacao = _decodificar(mm[inicio:fim])
+
+    # Uma página cortada no meio de uma linha (lidas == 0) continua na mesma linha.
+    continuacao_seguinte = f"{fim}:{linha + lidas}:{versao}" if fim < tamanho else None
+    return Trecho(
+        texto=texto,
+        linha_inicial=linha,
+        linha_final=max(linha, linha + lidas - 1),
+        total_linhas=mapa.total_linhas,
+        byte_inicial=inicio,
+        byte_final=fim,
+        tamanho=tamanho,
+        codificacao=codificacao,
+        continuacao=continuacao_seguinte,
+    )
+
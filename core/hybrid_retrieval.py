@@ -0,0 +1,102 @@
+"""Recuperação híbrida: BM25 do índice léxico + similaridade vetorial com fusão RRF."""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+from langchain_chroma import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from .lexical_index import ConsultaLexica, IndiceLexico
+from .tracing import registrar_evento
+
+
+def _chave_documento(doc: Document) -> str:
+    return doc.id or f"{doc.metadata.get('source')}\0{doc.page_content}"
+
+
+def fundir_rrf(listas: list[list[Document]], k: int, rrf_k: int) -> list[Document]:
+    """Reciprocal rank fusion: cada lista contribui com 1 / (rrf_k + posição)."""
+    pontuacoes: dict[str, float] = {}
+    documentos: dict[str, Document] = {}
+    for lista in listas:
+        for posicao, doc in enumerate(lista, start=1):
+            chave = _chave_documento(doc)
+            pontuacoes[chave] = pontuacoes.get(chave, 0.0) + 1.0 / (rrf_k + posicao)
+            documentos.setdefault(chave, doc)
+    ordenadas = sorted(pontuacoes, key=pontuacoes.__getitem__, reverse=True)
+    return [documentos[chave] for chave in ordenadas[:k]]
+
+
+class RecuperadorHibrido(BaseRetriever):
+    """Combina o índice léxico e o Chroma; identificadores exatos dispensam o embedding.
+
+    Quando a pergunta contém identificadores (ex.: `usc_04_142`, `/api/protocolos`)
+    presentes em no máximo `k` chunks, o resultado léxico é considerado decisivo
+    e devolvido sem calcular o embedding da pergunta. A decomposição do tempo
+    de cada recuperação vai para o evento `recuperacao` do rastreamento.
+    """
+
+    vectorstore: Chroma
+    indice: IndiceLexico
+    k: int = 4
+    candidatos: int = 20
+    rrf_k: int = 60
+    atalho_lexico: bool = True
+
+    @property
+    def search_type(self) -> str:
+        return "hibrido"
+
+    @property
+    def search_kwargs(self) -> dict[str, Any]:
+        return {"k": self.k, "candidatos": self.candidatos, "rrf_k": self.rrf_k}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        inicio = time.perf_counter()
+        tempos: dict[str, float] = {}
+
+        consulta = ConsultaLexica(query)
+        lexicos = [doc for doc, _ in self.indice.buscar(consulta, self.candidatos)]
+        exatos = self.indice.buscar_identificadores(consulta, self.k) if self.atalho_lexico else []
+        decisivo = 0 < len(exatos) <= self.k
+        tempos["lexica_ms"] = (time.perf_counter() - inicio) * 1000
+
+        if decisivo:
+            # Os chunks com o identificador vêm primeiro; as vagas restantes ficam
+            # com os melhores da busca por todos os termos.
+            chaves = {_chave_documento(doc) for doc in exatos}
+            complemento = [doc for doc in lexicos if _chave_documento(doc) not in chaves]
+            documentos = (exatos + complemento)[: self.k]
+        else:
+            marco = time.perf_counter()
+            vetor = self.vectorstore.embeddings.embed_query(query)
+            tempos["embedding_ms"] = (time.perf_counter() - marco) * 1000
+            marco = time.perf_counter()
+            vetoriais = self.vectorstore.similarity_search_by_vector(vetor, k=self.candidatos)
+            tempos["vetorial_ms"] = (time.perf_counter() - marco) * 1000
+            marco = time.perf_counter()
+            documentos = fundir_rrf([lexicos, vetoriais], self.k, self.rrf_k)
+            tempos["fusao_ms"] = (time.perf_counter() - marco) * 1000
+
+        tempos["total_ms"] = (time.perf_counter() - inicio) * 1000
+        recuperacao = {"caminho": "lexico" if decisivo else "hibrido", **tempos}
+        registrar_evento(logging.INFO, "recuperacao", resumo=formatar_recuperacao(recuperacao))
+        return documentos
+
+
+def formatar_recuperacao(dados: dict[str, Any]) -> str:
+    rotulos = [
+        ("lexica_ms", "léxica"),
+        ("embedding_ms", "embedding"),
+        ("vetorial_ms", "vetorial"),
+        ("fusao_ms", "fusão"),
+    ]
+    partes = [f"{rotulo} {dados[campo]:.1f} ms" for campo, rotulo in rotulos if campo in dados]
+    caminho = "atalho léxico" if dados.get("caminho") == "lexico" else "híbrida"
+    return f"Recuperação {caminho}: {', '.join(partes)} (total {dados.get('total_ms', 0):.1f} ms)"
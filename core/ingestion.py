@@ -0,0 +1,788 @@
+"""Ingestão incremental da base RAG guiada por um manifesto de hashes."""
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+from . import config
+from .embedding_cache import CachedEmbeddings, criar_embeddings_consulta
+from .embedding_pipeline import BatchWriter, LoteChunks, criar_embeddings_ingestao
+from .lexical_index import IndiceLexico, abrir_indice_lexico
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+MANIFEST_FILE = config.DB_DIR / "manifesto_ingestao.json"
+MANIFEST_VERSION = 1
+INTERVALO_SALVAMENTO_MANIFESTO = 2.0
+ESCOPO_DOCS = "docs"
+PREFIXO_ESCOPO_PROJETO = "projeto:"
+
+_SEPARADORES_VUE = [
+    "\n<template",
+    "\n<script",
+    "\n<style",
+    *RecursiveCharacterTextSplitter.get_separators_for_language(Language.JS),
+]
+# Separadores em regex para SQL/PLSQL: quebra preferencialmente entre objetos
+# (procedures, functions, packages) e depois entre comandos.
+_SEPARADORES_SQL = [
+    r"\n(?=(?i:create\s+(?:or\s+replace\s+)?(?:package|procedure|function|trigger|view|table)))",
+    r"\n(?=(?i:(?:procedure|function)\s))",
+    r"\n(?=(?i:begin|declare|exception)\b)",
+    r";\n",
+    r"\n\n",
+    r"\n",
+    r" ",
+    r"",
+]
+LINGUAGENS_CODIGO: dict[str, str] = {
+    ".ts": "ts",
+    ".tsx": "ts",
+    ".js": "js",
+    ".jsx": "js",
+    ".mjs": "js",
+    ".cjs": "js",
+    ".vue": "vue",
+    ".sql": "sql",
+    ".pks": "sql",
+    ".pkb": "sql",
+    ".prc": "sql",
+    ".fnc": "sql",
+    ".py": "python",
+    ".java": "java",
+    ".html": "html",
+    ".md": "markdown",
+}
+
+
+@dataclass
+class RelatorioIngestao:
+    arquivos_adicionados: list[str] = field(default_factory=list)
+    arquivos_atualizados: list[str] = field(default_factory=list)
+    arquivos_removidos: list[str] = field(default_factory=list)
+    arquivos_inalterados: int = 0
+    chunks_adicionados: int = 0
+    chunks_removidos: int = 0
+    arquivos_ignorados: list[str] = field(default_factory=list)
+    reconstrucao_completa: bool = False
+    escopos_reconstruidos: list[str] = field(default_factory=list)
+    estatisticas_cache: str | None = None
+
+    @property
+    def houve_alteracao(self) -> bool:
+        return bool(
+            self.arquivos_adicionados or self.arquivos_atualizados or self.arquivos_removidos
+        )
+
+    def formatar(self) -> str:
+        linhas = ["Ingestão concluída."]
+        if self.reconstrucao_completa:
+            linhas.append("- Modo: reconstrução completa da base vetorial")
+        elif self.escopos_reconstruidos:
+            linhas.append(f"- Modo: reconstrução completa de {', '.join(self.escopos_reconstruidos)}")
+        linhas.extend(
+            [
+                f"- Arquivos adicionados: {len(self.arquivos_adicionados)}",
+                f"- Arquivos atualizados: {len(self.arquivos_atualizados)}",
+                f"- Arquivos removidos: {len(self.arquivos_removidos)}",
+                f"- Arquivos inalterados: {self.arquivos_inalterados}",
+                f"- Chunks adicionados: {self.chunks_adicionados}",
+                f"- Chunks removidos: {self.chunks_removidos}",
+                f"- Arquivos ignorados: {len(self.arquivos_ignorados)}",
+            ]
+        )
+        for titulo, itens in (
+            ("Adicionados", self.arquivos_adicionados),
+            ("Atualizados", self.arquivos_atualizados),
+            ("Removidos", self.arquivos_removidos),
+            ("Ignorados", self.arquivos_ignorados),
+        ):
+            if itens:
+                linhas.append(f"{titulo}:")
+                linhas.extend(f"  - {item}" for item in sorted(itens))
+        if self.estatisticas_cache:
+            linhas.append(self.estatisticas_cache)
+        return "\n".join(linhas)
+
+
+def _hash_texto(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _manifesto_vazio() -> dict[str, Any]:
+    return {"versao": MANIFEST_VERSION, "revisao": 0, "arquivos": {}}
+
+
+def carregar_manifesto(caminho: Path = MANIFEST_FILE) -> dict[str, Any] | None:
+    if not caminho.is_file():
+        return None
+    try:
+        dados = json.loads(caminho.read_text(encoding="utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if not isinstance(dados, dict) or dados.get("versao") != MANIFEST_VERSION:
+        return None
+    dados.setdefault("revisao", 0)
+    dados.setdefault("arquivos", {})
+    return dados
+
+
+def salvar_manifesto(manifesto: dict[str, Any], caminho: Path = MANIFEST_FILE) -> None:
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix(".tmp")
+    temporario.write_text(json.dumps(manifesto, ensure_ascii=False, indent=2), encoding="utf-8")
+    temporario.replace(caminho)
+
+
+@dataclass(frozen=True)
+class EstadoIndice:
+    """Resumo do manifesto usado para validar as respostas em cache."""
+
+    revisao: int = 0
+    # Revisão em que a fonte mais recente entrou na base.
+    revisao_ultima_adicao: int = 0
+    # Hash do conteúdo indexado de cada fonte (None enquanto a fonte não terminou de ser gravada).
+    hashes: dict[str, str | None] = field(default_factory=dict)
+
+
+_ESTADO_POR_MTIME: tuple[int, EstadoIndice] | None = None
+
+
+def estado_indice(caminho: Path = MANIFEST_FILE) -> EstadoIndice:
+    """Estado atual da base; o manifesto só é relido quando o arquivo muda."""
+    global _ESTADO_POR_MTIME
+    try:
+        mtime = caminho.stat().st_mtime_ns
+    except OSError:
+        return EstadoIndice()
+    if _ESTADO_POR_MTIME is None or _ESTADO_POR_MTIME[0] != mtime:
+        manifesto = carregar_manifesto(caminho) or {}
+        estado = EstadoIndice(
+            revisao=int(manifesto.get("revisao", 0)),
+            revisao_ultima_adicao=int(manifesto.get("revisao_ultima_adicao", 0)),
+            hashes={fonte: registro.get("hash") for fonte, registro in manifesto.get("arquivos", {}).items()},
+        )
+        _ESTADO_POR_MTIME = (mtime, estado)
+    return _ESTADO_POR_MTIME[1]
+
+
+def abrir_vector_store(embeddings: Any | None = None) -> Chroma:
+    return Chroma(
+        persist_directory=str(config.DB_DIR),
+        embedding_function=embeddings if embeddings is not None else criar_embeddings_consulta(),
+    )
+
+
+def _criar_splitter(linguagem: str | None = None) -> RecursiveCharacterTextSplitter:
+    if linguagem == "vue":
+        return RecursiveCharacterTextSplitter(
+            separators=_SEPARADORES_VUE, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+        )
+    if linguagem == "sql":
+        return RecursiveCharacterTextSplitter(
+            separators=_SEPARADORES_SQL,
+            is_separator_regex=True,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+        )
+    if linguagem:
+        return RecursiveCharacterTextSplitter.from_language(
+            Language(linguagem), chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+        )
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+
+_SPLITTERS: dict[str | None, RecursiveCharacterTextSplitter] = {}
+
+
+def _obter_splitter(linguagem: str | None) -> RecursiveCharacterTextSplitter:
+    # Um splitter por linguagem e por processo: os workers do pool reaproveitam a instância.
+    splitter = _SPLITTERS.get(linguagem)
+    if splitter is None:
+        splitter = _SPLITTERS[linguagem] = _criar_splitter(linguagem)
+    return splitter
+
+
+def _fonte_relativa(caminho: Path) -> str:
+    return str(caminho.relative_to(config.BASE_DIR))
+
+
+def _percorrer_arquivos(raiz: Path, ignorar_dirs: frozenset[str] = frozenset()) -> Iterator[Path]:
+    """Percorre a árvore sob demanda, em ordem estável, sem materializar a lista."""
+    for diretorio, subdiretorios, nomes in os.walk(raiz):
+        subdiretorios[:] = sorted(nome for nome in subdiretorios if nome not in ignorar_dirs)
+        for nome in sorted(nomes):
+            yield Path(diretorio) / nome
+
+
+def contextos_do_caminho(caminho: str) -> list[str]:
+    """Contextos de `CONTEXT_DEFINITIONS` cujas dicas ou aliases aparecem no caminho."""
+    normalizado = caminho.lower().replace("-", "_")
+    encontrados: list[str] = []
+    for nome, definicao in config.CONTEXT_DEFINITIONS.items():
+        termos = [dica for dicas in definicao["hints"].values() for dica in dicas]
+        termos.extend(definicao["aliases"])
+        for termo in termos:
+            termo_normalizado = termo.lower().replace("-", "_").strip()
+            if termo_normalizado and termo_normalizado in normalizado:
+                encontrados.append(nome)
+                break
+    return encontrados
+
+
+@dataclass
+class EscopoIngestao:
+    """Árvore indexada em uma execução (a pasta docs/ ou um projeto configurado)."""
+
+    nome: str
+    raiz: Path
+    projeto: str | None = None
+
+    @property
+    def eh_codigo(self) -> bool:
+        return self.projeto is not None
+
+
+@dataclass
+class TarefaArquivo:
+    caminho: str
+    fonte: str
+    escopo: str
+    projeto: str | None
+    linguagem: str | None
+    tamanho: int
+    mtime: int
+    hash_anterior: str | None
+    metadata: dict[str, Any]
+    cabecalho: str
+
+
+@dataclass
+class ArquivoPreparado:
+    tarefa: TarefaArquivo
+    hash: str | None = None
+    chunks: list[tuple[str, str, Document]] | None = None
+    motivo_ignorado: str | None = None
+
+
+def _dividir_documento(
+    splitter: RecursiveCharacterTextSplitter,
+    fonte: str,
+    texto: str,
+    metadata: dict[str, Any] | None = None,
+    cabecalho: str | None = None,
+) -> list[tuple[str, str, Document]]:
+    """Divide o arquivo e devolve `(chunk_id, hash_chunk, documento)` em ordem.
+
+    O id é derivado da fonte e do hash do chunk, de modo que chunks idênticos
+    entre duas versões do arquivo mantêm o mesmo id e não são reprocessados.
+    """
+    metadata = {"source": fonte, **(metadata or {})}
+    conteudo = f"{cabecalho or f'Fonte: {fonte}'}\n\n{texto}"
+    documento = Document(page_content=conteudo, metadata=metadata)
+    ocorrencias: dict[str, int] = {}
+    resultado: list[tuple[str, str, Document]] = []
+    for chunk in splitter.split_documents([documento]):
+        hash_chunk = _hash_texto(chunk.page_content)
+        ocorrencia = ocorrencias.get(hash_chunk, 0)
+        ocorrencias[hash_chunk] = ocorrencia + 1
+        chunk_id = _hash_texto(f"{fonte}\0{hash_chunk}\0{ocorrencia}")
+        chunk.metadata = {**chunk.metadata, "chunk_hash": hash_chunk}
+        resultado.append((chunk_id, hash_chunk, chunk))
+    return resultado
+
+
+def _preparar_arquivo(tarefa: TarefaArquivo) -> ArquivoPreparado:
+    """Lê e divide um arquivo. Roda tanto na thread principal quanto no pool de processos."""
+    try:
+        texto = Path(tarefa.caminho).read_bytes().decode("utf-8")
+    except UnicodeDecodeError:
+        return ArquivoPreparado(tarefa, motivo_ignorado="não está em UTF-8")
+    except OSError as exc:
+        return ArquivoPreparado(tarefa, motivo_ignorado=f"erro de leitura: {exc.strerror}")
+    hash_arquivo = _hash_texto(texto)
+    if hash_arquivo == tarefa.hash_anterior:
+        # Só o mtime mudou; não há o que dividir.
+        return ArquivoPreparado(tarefa, hash=hash_arquivo)
+    chunks = _dividir_documento(
+        _obter_splitter(tarefa.linguagem),
+        tarefa.fonte,
+        texto,
+        metadata=tarefa.metadata,
+        cabecalho=tarefa.cabecalho,
+    )
+    return ArquivoPreparado(tarefa, hash=hash_arquivo, chunks=chunks)
+
+
+def _registrar_ignorado(
+    fonte: str,
+    motivo: str,
+    registros: dict[str, Any],
+    relatorio: RelatorioIngestao,
+    fontes_vistas: set[str],
+) -> None:
+    # Um arquivo já indexado que não pôde ser relido mantém os chunks atuais,
+    # em vez de ser removido da base como se tivesse sido apagado.
+    if fonte in registros:
+        fontes_vistas.add(fonte)
+        motivo = f"{motivo}; mantida a versão já indexada"
+    relatorio.arquivos_ignorados.append(f"{fonte} ({motivo})")
+
+
+def _criar_tarefa(
+    escopo: EscopoIngestao,
+    caminho: Path,
+    registros: dict[str, Any],
+    relatorio: RelatorioIngestao,
+    fontes_vistas: set[str],
+) -> TarefaArquivo | None:
+    """Monta a tarefa de leitura de um arquivo, ou `None` se ele não precisa ser lido."""
+    linguagem = None
+    if escopo.eh_codigo:
+        linguagem = LINGUAGENS_CODIGO.get(caminho.suffix.lower())
+        if linguagem is None:
+            return None
+        fonte = str(caminho)
+    else:
+        fonte = _fonte_relativa(caminho)
+    try:
+        info = caminho.stat()
+    except OSError as exc:
+        _registrar_ignorado(fonte, f"erro ao acessar: {exc.strerror}", registros, relatorio, fontes_vistas)
+        return None
+    anterior = registros.get(fonte)
+    if (
+        anterior
+        and anterior.get("hash")
+        and anterior.get("tamanho") == info.st_size
+        and anterior.get("mtime") == info.st_mtime_ns
+    ):
+        fontes_vistas.add(fonte)
+        relatorio.arquivos_inalterados += 1
+        return None
+    limite_bytes = config.INGESTION_MAX_FILE_BYTES
+    if info.st_size > limite_bytes:
+        _registrar_ignorado(
+            fonte,
+            f"{info.st_size} bytes, acima do limite de {limite_bytes}",
+            registros,
+            relatorio,
+            fontes_vistas,
+        )
+        return None
+
+    metadata: dict[str, Any] = {}
+    cabecalho = None
+    if escopo.eh_codigo:
+        stack = config.PROJECT_FRAMEWORKS.get(escopo.projeto or "", "")
+        relativo = str(caminho.relative_to(escopo.raiz))
+        contextos = contextos_do_caminho(relativo)
+        metadata = {
+            "tipo": "codigo",
+            "projeto": escopo.projeto,
+            "stack": stack,
+            "linguagem": linguagem,
+            "caminho_relativo": relativo,
+            "contextos": ",".join(contextos),
+        }
+        linhas = [f"Fonte: {fonte}", f"Projeto: {escopo.projeto} ({stack or 'stack não informada'})"]
+        if contextos:
+            linhas.append(f"Contextos: {', '.join(contextos)}")
+        cabecalho = "\n".join(linhas)
+    return TarefaArquivo(
+        caminho=str(caminho),
+        fonte=fonte,
+        escopo=escopo.nome,
+        projeto=escopo.projeto,
+        linguagem=linguagem,
+        tamanho=info.st_size,
+        mtime=info.st_mtime_ns,
+        hash_anterior=anterior.get("hash") if anterior else None,
+        metadata=metadata,
+        cabecalho=cabecalho,
+    )
+
+
+def _tarefas_do_escopo(
+    escopo: EscopoIngestao,
+    registros: dict[str, Any],
+    relatorio: RelatorioIngestao,
+    fontes_vistas: set[str],
+) -> Iterator[TarefaArquivo]:
+    """Gera as tarefas de leitura, pulando arquivos inalterados ou grandes demais."""
+    ignorar = frozenset(config.IGNORAR_DIRS) if escopo.eh_codigo else frozenset()
+    for caminho in _percorrer_arquivos(escopo.raiz, ignorar):
+        tarefa = _criar_tarefa(escopo, caminho, registros, relatorio, fontes_vistas)
+        if tarefa is not None:
+            yield tarefa
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _mapear_em_janelas(
+    executor: ProcessPoolExecutor, funcao: Callable[[T], R], itens: Iterable[T], janela: int
+) -> Iterator[R]:
+    """`executor.map` preguiçoso: mantém no máximo `janela` tarefas em voo, em ordem."""
+    fila: list[Future] = []
+    for item in itens:
+        fila.append(executor.submit(funcao, item))
+        if len(fila) >= janela:
+            yield fila.pop(0).result()
+    while fila:
+        yield fila.pop(0).result()
+
+
+def _preparar_escopo(
+    escopo: EscopoIngestao,
+    tarefas: Iterable[TarefaArquivo],
+    executor: ProcessPoolExecutor | None,
+    processos: int,
+) -> Iterator[ArquivoPreparado]:
+    if escopo.eh_codigo and executor is not None:
+        return _mapear_em_janelas(executor, _preparar_arquivo, tarefas, processos * 4)
+    return map(_preparar_arquivo, tarefas)
+
+
+def _limite_bytes_lote(max_workers: int) -> int:
+    # O teto de memória é dividido entre o lote em montagem e os lotes em voo.
+    lotes_simultaneos = max_workers * 2 + 1
+    return max(64 * 1024, config.INGESTION_MAX_MEMORY_MB * 1024 * 1024 // lotes_simultaneos)
+
+
+def _colecao_possui_registros(vector_store: Chroma) -> bool:
+    return bool(vector_store.get(limit=1, include=[]).get("ids"))
+
+
+def escopos_de_projetos(projetos: Iterable[str] | None = None) -> list[EscopoIngestao]:
+    """Escopos para os projetos pedidos (ou todos os configurados em `PROJECT_PATHS`)."""
+    chaves = list(projetos) if projetos else list(config.PROJECT_PATHS)
+    escopos: list[EscopoIngestao] = []
+    for chave in chaves:
+        if chave not in config.PROJECT_PATHS:
+            raise ValueError(
+                f"Projeto '{chave}' não está em projectDirs. Opções: {', '.join(sorted(config.PROJECT_PATHS))}."
+            )
+        raiz = config.PROJECT_PATHS[chave]
+        if not raiz or not raiz.is_dir():
+            print(f"[Ingestão] Projeto '{chave}' ignorado: diretório '{raiz}' não encontrado.")
+            continue
+        escopos.append(EscopoIngestao(f"{PREFIXO_ESCOPO_PROJETO}{chave}", raiz, projeto=chave))
+    return escopos
+
+
+class _ExecucaoIngestao:
+    """Estado de uma execução: manifesto, relatório e chunks ainda não gravados."""
+
+    def __init__(
+        self,
+        vector_store: Chroma,
+        manifesto: dict[str, Any],
+        relatorio: RelatorioIngestao,
+        indice_lexico: IndiceLexico | None = None,
+    ) -> None:
+        self.vector_store = vector_store
+        self.indice_lexico = indice_lexico
+        self.manifesto = manifesto
+        self.registros: dict[str, Any] = manifesto["arquivos"]
+        self.relatorio = relatorio
+        self.fontes_vistas: set[str] = set()
+        # fonte -> (hash final do arquivo, chunks ainda não gravados)
+        self.pendentes: dict[str, tuple[str, int]] = {}
+        self._revisao_incrementada = False
+        self._ultimo_salvamento = time.monotonic()
+
+    def marcar_alteracao(self) -> None:
+        if not self._revisao_incrementada:
+            self.manifesto["revisao"] = int(self.manifesto.get("revisao", 0)) + 1
+            self._revisao_incrementada = True
+
+    def ao_gravar(self, lote: LoteChunks) -> None:
+        for chunk_id, documento in lote:
+            fonte = documento.metadata["source"]
+            self.registros[fonte]["chunks"][chunk_id] = documento.metadata["chunk_hash"]
+            hash_arquivo, restantes = self.pendentes[fonte]
+            restantes -= 1
+            if restantes:
+                self.pendentes[fonte] = (hash_arquivo, restantes)
+            else:
+                del self.pendentes[fonte]
+                self.registros[fonte]["hash"] = hash_arquivo
+        if self.indice_lexico is not None:
+            self.indice_lexico.adicionar(lote)
+        self.relatorio.chunks_adicionados += len(lote)
+        agora = time.monotonic()
+        if agora - self._ultimo_salvamento >= INTERVALO_SALVAMENTO_MANIFESTO:
+            salvar_manifesto(self.manifesto)
+            self._ultimo_salvamento = agora
+
+    def processar(self, arquivo: ArquivoPreparado, gravador: BatchWriter) -> None:
+        tarefa = arquivo.tarefa
+        fonte = tarefa.fonte
+        if arquivo.motivo_ignorado:
+            _registrar_ignorado(
+                fonte, arquivo.motivo_ignorado, self.registros, self.relatorio, self.fontes_vistas
+            )
+            return
+        self.fontes_vistas.add(fonte)
+        anterior = self.registros.get(fonte)
+        if arquivo.chunks is None:
+            # Só o mtime mudou: atualiza o registro sem tocar nos vetores.
+            anterior.update(tamanho=tarefa.tamanho, mtime=tarefa.mtime, escopo=tarefa.escopo)
+            self.relatorio.arquivos_inalterados += 1
+            return
+
+        self.marcar_alteracao()
+        if anterior is None:
+            # Uma fonte nova pode responder melhor perguntas já respondidas (answer_cache).
+            self.manifesto["revisao_ultima_adicao"] = self.manifesto["revisao"]
+        chunks = arquivo.chunks
+        chunks_anteriores: dict[str, str] = dict(anterior.get("chunks", {})) if anterior else {}
+        ids_atuais = {chunk_id for chunk_id, _, _ in chunks}
+        obsoletos = [chunk_id for chunk_id in chunks_anteriores if chunk_id not in ids_atuais]
+        novos = [(chunk_id, doc) for chunk_id, _, doc in chunks if chunk_id not in chunks_anteriores]
+
+        if obsoletos:
+            self._apagar_chunks(obsoletos)
+        # O hash só é gravado quando todos os chunks novos estiverem na base;
+        # até lá o registro guarda apenas os chunks já persistidos.
+        self.registros[fonte] = {
+            "hash": None if novos else arquivo.hash,
+            "tamanho": tarefa.tamanho,
+            "mtime": tarefa.mtime,
+            "escopo": tarefa.escopo,
+            "chunks": {
+                chunk_id: hash_chunk
+                for chunk_id, hash_chunk in chunks_anteriores.items()
+                if chunk_id in ids_atuais
+            },
+        }
+        self.relatorio.chunks_removidos += len(obsoletos)
+        if anterior:
+            self.relatorio.arquivos_atualizados.append(fonte)
+        else:
+            self.relatorio.arquivos_adicionados.append(fonte)
+
+        if novos:
+            self.pendentes[fonte] = (arquivo.hash, len(novos))
+            for chunk_id, doc in novos:
+                gravador.adicionar(chunk_id, doc)
+
+    def _apagar_chunks(self, ids: list[str]) -> None:
+        self.vector_store.delete(ids=ids)
+        if self.indice_lexico is not None:
+            self.indice_lexico.remover(ids)
+
+    def remover(self, fonte: str) -> None:
+        self.marcar_alteracao()
+        ids = list(self.registros.pop(fonte).get("chunks", {}))
+        if ids:
+            self._apagar_chunks(ids)
+        self.relatorio.chunks_removidos += len(ids)
+        self.relatorio.arquivos_removidos.append(fonte)
+
+    def descartar_escopos(self, nomes: set[str]) -> None:
+        """Apaga chunks e registros dos escopos, para que sejam reindexados do zero."""
+        for fonte in [f for f, registro in self.registros.items() if registro.get("escopo", ESCOPO_DOCS) in nomes]:
+            self.marcar_alteracao()
+            ids = list(self.registros.pop(fonte).get("chunks", {}))
+            if ids:
+                self._apagar_chunks(ids)
+            self.relatorio.chunks_removidos += len(ids)
+        self.relatorio.escopos_reconstruidos = sorted(nomes)
+
+    def finalizar(self) -> None:
+        if self.relatorio.reconstrucao_completa:
+            self.marcar_alteracao()
+        salvar_manifesto(self.manifesto)
+        if self.indice_lexico is not None:
+            self.indice_lexico.definir_revisao(int(self.manifesto["revisao"]))
+
+
+class IndexadorIncremental:
+    """Mantém embeddings e vector store abertos para sincronizações repetidas.
+
+    `sincronizar` varre escopos inteiros (uso do `ingest.py`); `atualizar_arquivos`
+    reprocessa só os caminhos informados e é usado pela indexação em segundo plano.
+    """
+
+    def __init__(
+        self,
+        tamanho_lote: int | None = None,
+        max_workers: int | None = None,
+        processos: int | None = None,
+    ) -> None:
+        self.tamanho_lote = tamanho_lote or config.INGESTION_BATCH_SIZE
+        self.max_workers = max_workers or config.INGESTION_MAX_WORKERS
+        self.processos = processos or config.INGESTION_PROCESS_WORKERS
+        config.DB_DIR.mkdir(exist_ok=True)
+        self.embeddings = criar_embeddings_ingestao()
+        self.vector_store = abrir_vector_store(self.embeddings)
+        self.indice_lexico = abrir_indice_lexico()
+
+    def _gravador(self, execucao: _ExecucaoIngestao) -> BatchWriter:
+        return BatchWriter(
+            self.vector_store,
+            tamanho_lote=self.tamanho_lote,
+            max_workers=self.max_workers,
+            ao_gravar=execucao.ao_gravar,
+            max_bytes_lote=_limite_bytes_lote(self.max_workers),
+        )
+
+    def _anexar_estatisticas(self, relatorio: RelatorioIngestao) -> None:
+        if isinstance(self.embeddings, CachedEmbeddings):
+            relatorio.estatisticas_cache = self.embeddings.formatar_estatisticas()
+
+    def sincronizar(self, escopos: list[EscopoIngestao], completa: bool = False) -> RelatorioIngestao:
+        relatorio = RelatorioIngestao()
+        manifesto = carregar_manifesto()
+        if manifesto is None:
+            # Sem manifesto não há como saber quais vetores já existem; bases antigas
+            # criadas pelo `from_documents` são recriadas para eliminar duplicatas.
+            if _colecao_possui_registros(self.vector_store):
+                self.vector_store.reset_collection()
+            manifesto = _manifesto_vazio()
+            relatorio.reconstrucao_completa = True
+            if self.indice_lexico is not None:
+                self.indice_lexico.limpar()
+        else:
+            self._sincronizar_indice_lexico(int(manifesto["revisao"]))
+        execucao = _ExecucaoIngestao(self.vector_store, manifesto, relatorio, self.indice_lexico)
+        if completa and not relatorio.reconstrucao_completa:
+            # Só os escopos selecionados são recriados; os demais continuam na base.
+            execucao.descartar_escopos({escopo.nome for escopo in escopos})
+
+        usa_pool = any(escopo.eh_codigo for escopo in escopos) and self.processos > 1
+        # "spawn" evita herdar por fork as threads do Chroma e do pool de embeddings.
+        executor = (
+            ProcessPoolExecutor(
+                max_workers=self.processos, mp_context=multiprocessing.get_context("spawn")
+            )
+            if usa_pool
+            else None
+        )
+        try:
+            with self._gravador(execucao) as gravador:
+                for escopo in escopos:
+                    tarefas = _tarefas_do_escopo(
+                        escopo, execucao.registros, relatorio, execucao.fontes_vistas
+                    )
+                    for arquivo in _preparar_escopo(escopo, tarefas, executor, self.processos):
+                        execucao.processar(arquivo, gravador)
+                        # Libera o texto antes de consumir o próximo arquivo.
+                        del arquivo
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        nomes_escopos = {escopo.nome for escopo in escopos}
+        if ESCOPO_DOCS in nomes_escopos and not any(
+            execucao.registros.get(fonte, {}).get("escopo", ESCOPO_DOCS) == ESCOPO_DOCS
+            for fonte in execucao.fontes_vistas
+        ):
+            raise RuntimeError("Nenhum documento encontrado na pasta docs/. Adicione arquivos e tente novamente.")
+
+        for fonte in sorted(set(execucao.registros) - execucao.fontes_vistas):
+            if execucao.registros[fonte].get("escopo", ESCOPO_DOCS) in nomes_escopos:
+                execucao.remover(fonte)
+
+        execucao.finalizar()
+        self._anexar_estatisticas(relatorio)
+        return relatorio
+
+    def _sincronizar_indice_lexico(self, revisao: int) -> None:
+        # Bases criadas antes do índice léxico (ou com ele desativado) são
+        # reindexadas a partir dos chunks já gravados, sem gerar embeddings.
+        if self.indice_lexico is None or self.indice_lexico.revisao == revisao:
+            return
+        total = self.indice_lexico.reconstruir(self.vector_store, revisao)
+        print(f"[Ingestão] Índice léxico reconstruído a partir da base vetorial ({total} chunks).", flush=True)
+
+    def _escopo_do_caminho(self, caminho: Path, registros: dict[str, Any]) -> EscopoIngestao | None:
+        if caminho.is_relative_to(config.DOCS_DIR):
+            return EscopoIngestao(ESCOPO_DOCS, config.DOCS_DIR)
+        if any(parte in config.IGNORAR_DIRS for parte in caminho.parts):
+            return None
+        for chave, raiz in config.PROJECT_PATHS.items():
+            if not raiz or not caminho.is_relative_to(raiz):
+                continue
+            nome = f"{PREFIXO_ESCOPO_PROJETO}{chave}"
+            # Só acompanha projetos que já foram indexados com `ingest.py --projetos`.
+            if any(registro.get("escopo") == nome for registro in registros.values()):
+                return EscopoIngestao(nome, raiz, projeto=chave)
+        return None
+
+    def atualizar_arquivos(self, caminhos: Iterable[Path]) -> RelatorioIngestao:
+        """Reindexa apenas os arquivos informados (criados, alterados ou removidos)."""
+        manifesto = carregar_manifesto()
+        if manifesto is None:
+            return self.sincronizar([EscopoIngestao(ESCOPO_DOCS, config.DOCS_DIR)])
+        self._sincronizar_indice_lexico(int(manifesto["revisao"]))
+        relatorio = RelatorioIngestao()
+        execucao = _ExecucaoIngestao(self.vector_store, manifesto, relatorio, self.indice_lexico)
+        with self._gravador(execucao) as gravador:
+            for caminho in sorted({Path(c).resolve(strict=False) for c in caminhos}):
+                escopo = self._escopo_do_caminho(caminho, execucao.registros)
+                if escopo is None:
+                    continue
+                if not caminho.is_file():
+                    fonte = str(caminho) if escopo.eh_codigo else _fonte_relativa(caminho)
+                    if fonte in execucao.registros:
+                        execucao.remover(fonte)
+                    continue
+                tarefa = _criar_tarefa(
+                    escopo, caminho, execucao.registros, relatorio, execucao.fontes_vistas
+                )
+                if tarefa is not None:
+                    execucao.processar(_preparar_arquivo(tarefa), gravador)
+        if relatorio.houve_alteracao:
+            execucao.finalizar()
+        self._anexar_estatisticas(relatorio)
+        return relatorio
+
+
+def executar_ingestao(
+    completa: bool = False,
+    tamanho_lote: int | None = None,
+    max_workers: int | None = None,
+    projetos: Iterable[str] | None = None,
+    incluir_docs: bool = True,
+    processos: int | None = None,
+) -> RelatorioIngestao:
+    """Sincroniza `docs/` (e, opcionalmente, os projetos) com a base vetorial.
+
+    O fluxo é um pipeline de geradores (percorrer → ler → dividir → embutir →
+    gravar): apenas um arquivo por vez fica em memória, e os chunks seguem em
+    lotes limitados por quantidade e por bytes (`ingestion.maxMemoryMb`). Os
+    lotes são gravados por um pool de workers e o manifesto é salvo à medida
+    que terminam, de modo que uma execução interrompida retoma a partir do
+    último lote gravado.
+
+    Com `projetos`, o código dos diretórios de `PROJECT_PATHS` também é
+    indexado: leitura e divisão rodam em um pool de processos, com splitters
+    por linguagem e metadados de projeto/contexto em cada chunk.
+    """
+    escopos: list[EscopoIngestao] = []
+    if incluir_docs:
+        if not config.DOCS_DIR.exists():
+            raise FileNotFoundError("Pasta docs/ não encontrada. Crie-a antes de executar a ingestão.")
+        escopos.append(EscopoIngestao(ESCOPO_DOCS, config.DOCS_DIR))
+    if projetos is not None:
+        escopos.extend(escopos_de_projetos(projetos))
+    if not escopos:
+        raise RuntimeError("Nada a indexar: nenhum escopo de ingestão foi selecionado.")
+
+    indexador = IndexadorIncremental(tamanho_lote, max_workers, processos)
+    return indexador.sincronizar(escopos, completa=completa)
@@ -0,0 +1,183 @@
+"""Índice invertido (SQLite FTS5 com ranking BM25) mantido ao lado da base vetorial."""
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Iterable
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from . import config
+
+# Identificadores exatos: códigos de caso de uso (usc_04_142), rotas (/api/protocolos),
+# nomes de arquivo (protocolos.controller.ts) e termos que misturam letras e dígitos.
+_IDENTIFICADOR = re.compile(r"[\w-]+(?:[_./][\w-]+)+|/[\w-]+|\b(?=\w*\d)(?=\w*[^\W\d])\w+\b")
+_TERMO = re.compile(r"\w+")
+TAMANHO_MINIMO_TERMO = 2
+PAGINA_RECONSTRUCAO = 1000
+
+
+def _normalizar(texto: str) -> str:
+    return unicodedata.normalize("NFKC", texto).casefold()
+
+
+def _frase(termos: list[str]) -> str:
+    return '"' + " ".join(termos) + '"'
+
+
+class ConsultaLexica:
+    """Consulta FTS5 montada a partir de uma pergunta em linguagem natural."""
+
+    def __init__(self, pergunta: str) -> None:
+        texto = _normalizar(pergunta)
+        self.identificadores = [
+            _frase(partes)
+            for partes in (_TERMO.findall(trecho) for trecho in _IDENTIFICADOR.findall(texto))
+            if partes
+        ]
+        termos = [termo for termo in _TERMO.findall(texto) if len(termo) >= TAMANHO_MINIMO_TERMO]
+        self.termos = list(dict.fromkeys(_frase([termo]) for termo in termos))
+
+    @property
+    def vazia(self) -> bool:
+        return not self.termos and not self.identificadores
+
+    def expressao(self) -> str:
+        # Frases dos identificadores entram junto com os termos soltos: o BM25
+        # soma a pontuação de cada cláusula, favorecendo o trecho exato.
+        return " OR ".join(dict.fromkeys([*self.identificadores, *self.termos]))
+
+    def expressao_identificadores(self) -> str | None:
+        if not self.identificadores:
+            return None
+        return " AND ".join(dict.fromkeys(self.identificadores))
+
+
+class IndiceLexico:
+    """Índice BM25 dos mesmos chunks gravados no Chroma, identificados pelo mesmo id."""
+
+    def __init__(self, caminho: Path) -> None:
+        self._lock = threading.Lock()
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._conexao = sqlite3.connect(str(caminho), timeout=30, check_same_thread=False)
+        with self._conexao:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " id INTEGER PRIMARY KEY,"
+                " chunk_id TEXT NOT NULL UNIQUE,"
+                " metadata TEXT NOT NULL,"
+                " conteudo TEXT NOT NULL)"
+            )
+            self._conexao.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+                " conteudo, content='chunks', content_rowid='id',"
+                " tokenize='unicode61 remove_diacritics 2')"
+            )
+            self._conexao.execute(
+                "CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN"
+                " INSERT INTO chunks_fts(rowid, conteudo) VALUES (new.id, new.conteudo); END"
+            )
+            self._conexao.execute(
+                "CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN"
+                " INSERT INTO chunks_fts(chunks_fts, rowid, conteudo) VALUES ('delete', old.id, old.conteudo); END"
+            )
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS estado (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)"
+            )
+
+    @property
+    def revisao(self) -> int | None:
+        with self._lock:
+            linha = self._conexao.execute("SELECT valor FROM estado WHERE chave = 'revisao'").fetchone()
+        return int(linha[0]) if linha else None
+
+    def definir_revisao(self, revisao: int) -> None:
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO estado (chave, valor) VALUES ('revisao', ?)", (str(revisao),)
+            )
+
+    def adicionar(self, chunks: Iterable[tuple[str, Document]]) -> None:
+        with self._lock, self._conexao:
+            self._conexao.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, metadata, conteudo) VALUES (?, ?, ?)",
+                [
+                    (chunk_id, json.dumps(doc.metadata, ensure_ascii=False), doc.page_content)
+                    for chunk_id, doc in chunks
+                ],
+            )
+
+    def remover(self, chunk_ids: Iterable[str]) -> None:
+        with self._lock, self._conexao:
+            self._conexao.executemany(
+                "DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids]
+            )
+
+    def limpar(self) -> None:
+        with self._lock, self._conexao:
+            self._conexao.execute("DELETE FROM chunks")
+            self._conexao.execute("DELETE FROM estado")
+
+    def reconstruir(self, vector_store: Chroma, revisao: int) -> int:
+        """Recria o índice a partir dos chunks já gravados no Chroma."""
+        self.limpar()
+        total = 0
+        while True:
+            pagina = vector_store.get(
+                limit=PAGINA_RECONSTRUCAO, offset=total, include=["documents", "metadatas"]
+            )
+            ids = pagina.get("ids") or []
+            if not ids:
+                break
+            self.adicionar(
+                (chunk_id, Document(page_content=conteudo or "", metadata=metadata or {}))
+                for chunk_id, conteudo, metadata in zip(ids, pagina["documents"], pagina["metadatas"])
+            )
+            total += len(ids)
+        self.definir_revisao(revisao)
+        return total
+
+    def _consultar(self, expressao: str, limite: int) -> list[tuple[Document, float]]:
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT c.chunk_id, c.metadata, c.conteudo, bm25(chunks_fts) AS pontuacao"
+                " FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid"
+                " WHERE chunks_fts MATCH ? ORDER BY pontuacao LIMIT ?",
+                (expressao, limite),
+            ).fetchall()
+        return [
+            (Document(page_content=conteudo, metadata=json.loads(metadata), id=chunk_id), -pontuacao)
+            for chunk_id, metadata, conteudo, pontuacao in linhas
+        ]
+
+    def buscar(self, consulta: ConsultaLexica, limite: int) -> list[tuple[Document, float]]:
+        """Retorna os chunks mais relevantes com a pontuação BM25 (maior é melhor)."""
+        if consulta.vazia:
+            return []
+        return self._consultar(consulta.expressao(), limite)
+
+    def buscar_identificadores(self, consulta: ConsultaLexica, limite: int) -> list[Document]:
+        """Chunks que contêm todos os identificadores da consulta, até `limite` + 1.
+
+        O item a mais permite saber se há mais de `limite` chunks sem contá-los todos.
+        """
+        expressao = consulta.expressao_identificadores()
+        if expressao is None:
+            return []
+        return [doc for doc, _ in self._consultar(expressao, limite + 1)]
+
+    def total(self) -> int:
+        with self._lock:
+            return self._conexao.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+def abrir_indice_lexico() -> IndiceLexico | None:
+    if not config.HYBRID_SEARCH_ENABLED:
+        return None
+    return IndiceLexico(config.LEXICAL_INDEX_FILE)
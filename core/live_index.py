@@ -0,0 +1,144 @@
+"""Indexação incremental em segundo plano enquanto o agente está em execução."""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from pathlib import Path
+
+from watchfiles import DefaultFilter, watch
+
+from . import config
+from .ingestion import (
+    ESCOPO_DOCS,
+    PREFIXO_ESCOPO_PROJETO,
+    IndexadorIncremental,
+    carregar_manifesto,
+)
+from .tracing import iniciar_rastreamento, registrar_evento
+from .utils import OUVINTES_ALTERACAO
+
+
+class IndexadorEmSegundoPlano:
+    """Reindexa arquivos alterados sem bloquear a conversa.
+
+    Recebe eventos de `registrar_alteracao` (arquivos escritos pelo agente) e,
+    opcionalmente, de um observador do sistema de arquivos. Os caminhos são
+    acumulados até passar `debounce` segundos sem novos eventos e então apenas
+    os chunks dos arquivos afetados são atualizados na base vetorial.
+    """
+
+    def __init__(self, raizes: list[Path], debounce: float, observar_arquivos: bool) -> None:
+        self.raizes = raizes
+        self.debounce = debounce
+        self.observar_arquivos = observar_arquivos
+        self._pendentes: set[Path] = set()
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._parar = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._ultimo_evento = 0.0
+
+    def notificar(self, caminho: Path) -> None:
+        with self._lock:
+            self._pendentes.add(Path(caminho))
+            self._ultimo_evento = time.monotonic()
+        self._evento.set()
+
+    def iniciar(self) -> None:
+        OUVINTES_ALTERACAO.append(self.notificar)
+        self._threads.append(
+            threading.Thread(target=self._processar, name="indexacao-incremental", daemon=True)
+        )
+        if self.observar_arquivos and self.raizes:
+            self._threads.append(
+                threading.Thread(target=self._observar, name="indexacao-observador", daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+
+    def parar(self) -> None:
+        if self.notificar in OUVINTES_ALTERACAO:
+            OUVINTES_ALTERACAO.remove(self.notificar)
+        self._parar.set()
+        self._evento.set()
+        for thread in self._threads:
+            thread.join(timeout=10)
+
+    def _aguardar_silencio(self) -> None:
+        while not self._parar.is_set():
+            with self._lock:
+                restante = self._ultimo_evento + self.debounce - time.monotonic()
+            if restante <= 0:
+                return
+            self._parar.wait(restante)
+
+    def _processar(self) -> None:
+        indexador: IndexadorIncremental | None = None
+        while not self._parar.is_set():
+            self._evento.wait()
+            self._evento.clear()
+            self._aguardar_silencio()
+            with self._lock:
+                caminhos, self._pendentes = self._pendentes, set()
+            if not caminhos or self._parar.is_set():
+                continue
+            try:
+                if indexador is None:
+                    indexador = IndexadorIncremental(processos=1)
+                relatorio = indexador.atualizar_arquivos(caminhos)
+            except Exception as exc:  # noqa: BLE001
+                registrar_evento(logging.WARNING, "indexacao_falha", erro=str(exc))
+                continue
+            if relatorio.houve_alteracao:
+                alterados = (
+                    len(relatorio.arquivos_adicionados)
+                    + len(relatorio.arquivos_atualizados)
+                    + len(relatorio.arquivos_removidos)
+                )
+                registrar_evento(
+                    logging.INFO,
+                    "indexacao_concluida",
+                    arquivos=alterados,
+                    chunks_adicionados=relatorio.chunks_adicionados,
+                    chunks_removidos=relatorio.chunks_removidos,
+                )
+
+    def _observar(self) -> None:
+        filtro = DefaultFilter(ignore_dirs=(*DefaultFilter.ignore_dirs, *config.IGNORAR_DIRS))
+        try:
+            for alteracoes in watch(
+                *self.raizes,
+                watch_filter=filtro,
+                stop_event=self._parar,
+                raise_interrupt=False,
+            ):
+                for _, caminho in alteracoes:
+                    self.notificar(Path(caminho))
+        except Exception as exc:  # noqa: BLE001
+            registrar_evento(logging.WARNING, "indexacao_observador_desativado", erro=str(exc))
+
+
+def _raizes_indexadas() -> list[Path]:
+    manifesto = carregar_manifesto() or {"arquivos": {}}
+    escopos = {registro.get("escopo", ESCOPO_DOCS) for registro in manifesto["arquivos"].values()}
+    raizes = [config.DOCS_DIR] if config.DOCS_DIR.is_dir() else []
+    for chave, raiz in config.PROJECT_PATHS.items():
+        if raiz and raiz.is_dir() and f"{PREFIXO_ESCOPO_PROJETO}{chave}" in escopos:
+            raizes.append(raiz)
+    return raizes
+
+
+def iniciar_indexacao_em_segundo_plano() -> IndexadorEmSegundoPlano | None:
+    """Inicia a indexação incremental conforme `liveIndex`; `None` se estiver desativada."""
+    if not config.LIVE_INDEX_ENABLED or carregar_manifesto() is None:
+        return None
+    # Os eventos de indexação podem chegar antes do primeiro turno iniciar o rastreamento.
+    iniciar_rastreamento()
+    indexador = IndexadorEmSegundoPlano(
+        _raizes_indexadas(),
+        debounce=config.LIVE_INDEX_DEBOUNCE_SECONDS,
+        observar_arquivos=config.LIVE_INDEX_WATCH_FILESYSTEM,
+    )
+    indexador.iniciar()
+    return indexador
@@ -0,0 +1,118 @@
+"""Cache persistente de respostas do LLM com modo de reprodução estrita (replay)."""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import warnings
+from pathlib import Path
+from typing import Any
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from . import config
+
+MODO_DESLIGADO = "off"
+MODO_LEITURA_ESCRITA = "read-write"
+MODO_REPLAY = "replay"
+
+
+class RespostaNaoGravadaError(RuntimeError):
+    """Chamada ao LLM sem resposta gravada enquanto o cache está em modo replay."""
+
+
+def _sem_ids_de_mensagem(valor: Any) -> Any:
+    # O LangGraph atribui ids aleatórios às mensagens do estado; eles não mudam o
+    # conteúdo enviado à API e impediriam qualquer acerto entre execuções.
+    if isinstance(valor, list):
+        return [_sem_ids_de_mensagem(item) for item in valor]
+    if isinstance(valor, dict):
+        if valor.get("type") == "constructor" and isinstance(valor.get("kwargs"), dict):
+            kwargs = {k: v for k, v in valor["kwargs"].items() if k != "id"}
+            return {**valor, "kwargs": _sem_ids_de_mensagem(kwargs)}
+        return {chave: _sem_ids_de_mensagem(item) for chave, item in valor.items()}
+    return valor
+
+
+def _chave(prompt: str, llm_string: str) -> str:
+    try:
+        normalizado = json.dumps(_sem_ids_de_mensagem(json.loads(prompt)), sort_keys=True)
+    except json.JSONDecodeError:
+        normalizado = prompt
+    return hashlib.sha256(f"{llm_string}\0{normalizado}".encode("utf-8")).hexdigest()
+
+
+class CacheLLM(BaseCache):
+    """Guarda as gerações por (modelo e parâmetros, schemas das tools, mensagens).
+
+    `llm_string` do LangChain já serializa o modelo, os parâmetros e os
+    argumentos da chamada (incluindo as tools vinculadas); as mensagens entram
+    sem os ids internos. Em `replay`, uma chamada ausente do cache é um erro.
+    """
+
+    def __init__(self, caminho: Path, modo: str) -> None:
+        self.modo = modo
+        self.acertos = 0
+        self.faltas = 0
+        self._lock = threading.Lock()
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._conexao = sqlite3.connect(str(caminho), timeout=30, check_same_thread=False)
+        with self._conexao:
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS respostas_llm ("
+                " chave TEXT PRIMARY KEY,"
+                " llm_string TEXT NOT NULL,"
+                " geracoes TEXT NOT NULL,"
+                " criado_em REAL NOT NULL)"
+            )
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT geracoes FROM respostas_llm WHERE chave = ?", (_chave(prompt, llm_string),)
+            ).fetchone()
+            if linha is None:
+                self.faltas += 1
+            else:
+                self.acertos += 1
+        if linha is None:
+            if self.modo == MODO_REPLAY:
+                raise RespostaNaoGravadaError(
+                    "Modo replay: não há resposta gravada para esta chamada ao LLM. "
+                    "Grave as respostas com llmCache.mode = \"read-write\" antes de reproduzir."
+                )
+            return None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return loads(linha[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if self.modo != MODO_LEITURA_ESCRITA:
+            return
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO respostas_llm (chave, llm_string, geracoes, criado_em)"
+                " VALUES (?, ?, ?, ?)",
+                (_chave(prompt, llm_string), llm_string, dumps(list(return_val)), time.time()),
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._conexao:
+            self._conexao.execute("DELETE FROM respostas_llm")
+
+
+_CACHE: CacheLLM | None = None
+
+
+def obter_cache_llm() -> CacheLLM | None:
+    """Cache compartilhado por todos os `LegacyChatOpenAI`, conforme `llmCache.mode`."""
+    global _CACHE
+    if config.LLM_CACHE_MODE == MODO_DESLIGADO:
+        return None
+    if _CACHE is None:
+        _CACHE = CacheLLM(config.LLM_CACHE_FILE, config.LLM_CACHE_MODE)
+    return _CACHE
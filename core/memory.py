@@ -0,0 +1,158 @@
+"""Memória da conversa com orçamento de tokens e resumo incremental dos turnos antigos."""
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+from typing import Any
+
+import tiktoken
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from .tracing import registrar_evento
+
+TOKENS_POR_MENSAGEM = 4
+MARCA_TRUNCADO = "\n[... trecho removido para caber no orçamento de memória]"
+
+PROMPT_RESUMO = (
+    "Você mantém o resumo de uma conversa entre um desenvolvedor e um agente de migração.\n"
+    "Atualize o resumo abaixo incorporando as novas mensagens. Preserve decisões, arquivos "
+    "citados ou alterados, pendências e preferências do usuário; descarte cumprimentos e "
+    "repetições. Responda apenas com o resumo atualizado, em português, com no máximo "
+    "{max_palavras} palavras.\n\n"
+    "Resumo atual:\n{resumo}\n\n"
+    "Novas mensagens:\n{mensagens}"
+)
+
+
+@lru_cache(maxsize=None)
+def _codificador(modelo: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(modelo)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def contar_tokens(mensagens: list[BaseMessage], modelo: str) -> int:
+    codificador = _codificador(modelo)
+    return sum(
+        TOKENS_POR_MENSAGEM + len(codificador.encode(mensagem.text))
+        for mensagem in mensagens
+    )
+
+
+def _agrupar_turnos(historico: list[BaseMessage]) -> list[list[BaseMessage]]:
+    """Separa o histórico em turnos, cada um iniciado por uma mensagem do usuário."""
+    turnos: list[list[BaseMessage]] = []
+    for mensagem in historico:
+        if isinstance(mensagem, HumanMessage) or not turnos:
+            turnos.append([mensagem])
+        else:
+            turnos[-1].append(mensagem)
+    return turnos
+
+
+def historico_rag(historico: list[BaseMessage], turnos: int) -> list[tuple[str, str]]:
+    """Pares (pergunta, resposta) dos últimos turnos, no formato usado pela chain do RAG."""
+    pares: list[tuple[str, str]] = []
+    pergunta: str | None = None
+    for mensagem in historico:
+        if isinstance(mensagem, HumanMessage):
+            pergunta = mensagem.text
+        elif isinstance(mensagem, AIMessage) and pergunta is not None:
+            pares.append((pergunta, mensagem.text))
+            pergunta = None
+    return pares[-turnos:]
+
+
+def _transcrever(mensagens: list[BaseMessage]) -> str:
+    rotulos = {"human": "Usuário", "ai": "Agente", "system": "Sistema"}
+    return "\n".join(f"{rotulos.get(m.type, m.type)}: {m.text.strip()}" for m in mensagens)
+
+
+class MemoriaConversa:
+    """Mantém o histórico enviado ao agente dentro de `max_tokens`.
+
+    Os `turnos_recentes` mais novos são preservados na íntegra. Quando o
+    histórico passa do orçamento, os turnos mais antigos são incorporados a um
+    resumo atualizado incrementalmente até o histórico voltar à metade do
+    orçamento, de modo que o resumo não é refeito a cada turno. Se os turnos
+    recentes sozinhos passarem do orçamento, os mais antigos deles também vão
+    para o resumo; o último turno é mantido, com as mensagens mais longas
+    cortadas se ele ainda não couber.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        modelo: str,
+        max_tokens: int,
+        turnos_recentes: int,
+        max_tokens_resumo: int,
+    ) -> None:
+        self.llm = llm
+        self.modelo = modelo
+        self.max_tokens = max_tokens
+        self.turnos_recentes = turnos_recentes
+        self.max_tokens_resumo = max_tokens_resumo
+
+    def _resumir(self, resumo: str | None, mensagens: list[BaseMessage], config: Any = None) -> str:
+        prompt = PROMPT_RESUMO.format(
+            max_palavras=max(50, self.max_tokens_resumo * 3 // 4),
+            resumo=resumo or "(vazio)",
+            mensagens=_transcrever(mensagens),
+        )
+        resposta = self.llm.invoke([HumanMessage(content=prompt)], config=config)
+        return resposta.text.strip()
+
+    def _truncar(self, turno: list[BaseMessage], excesso: int) -> list[BaseMessage]:
+        """Corta o fim das mensagens mais longas do turno até remover `excesso` tokens."""
+        codificador = _codificador(self.modelo)
+        marca = len(codificador.encode(MARCA_TRUNCADO))
+        truncado = list(turno)
+        for posicao in sorted(range(len(turno)), key=lambda p: len(turno[p].text), reverse=True):
+            if excesso <= 0:
+                break
+            tokens = codificador.encode(turno[posicao].text)
+            manter = max(0, len(tokens) - excesso - marca)
+            if manter >= len(tokens):
+                continue
+            texto = codificador.decode(tokens[:manter]) + MARCA_TRUNCADO
+            truncado[posicao] = turno[posicao].model_copy(update={"content": texto})
+            excesso -= len(tokens) - len(codificador.encode(texto))
+        return truncado
+
+    def compactar(
+        self, historico: list[BaseMessage], resumo: str | None, config: Any = None
+    ) -> tuple[list[BaseMessage], str | None]:
+        total = contar_tokens(historico, self.modelo)
+        if total <= self.max_tokens:
+            return historico, resumo
+
+        turnos = _agrupar_turnos(historico)
+        alvo = self.max_tokens // 2
+        antigos: list[BaseMessage] = []
+        while len(turnos) > self.turnos_recentes and total > alvo:
+            turno = turnos.pop(0)
+            antigos.extend(turno)
+            total -= contar_tokens(turno, self.modelo)
+        # Um único turno com respostas longas pode estourar o orçamento sozinho.
+        while len(turnos) > 1 and total > self.max_tokens:
+            turno = turnos.pop(0)
+            antigos.extend(turno)
+            total -= contar_tokens(turno, self.modelo)
+        truncado = total > self.max_tokens
+        if truncado:
+            turnos[-1] = self._truncar(turnos[-1], total - self.max_tokens)
+
+        novo_resumo = self._resumir(resumo, antigos, config) if antigos else resumo
+        restante = [mensagem for turno in turnos for mensagem in turno]
+        registrar_evento(
+            logging.INFO,
+            "memoria_compactada",
+            mensagens_resumidas=len(antigos),
+            truncado=truncado,
+            tokens_historico=contar_tokens(restante, self.modelo),
+        )
+        return restante, novo_resumo
+
@@ -0,0 +1,170 @@
+"""Métricas por turno do agente: chamadas ao LLM, tools, recuperações e tempo total."""
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+
+
+def _uso_tokens(response) -> tuple[int, int, int]:
+    """Tokens de entrada, de saída e de entrada servidos pelo cache de prompt do provedor."""
+    for geracoes in response.generations:
+        for geracao in geracoes:
+            uso = getattr(getattr(geracao, "message", None), "usage_metadata", None)
+            if uso:
+                detalhes = uso.get("input_token_details") or {}
+                return uso.get("input_tokens", 0), uso.get("output_tokens", 0), detalhes.get("cache_read", 0) or 0
+    uso = (response.llm_output or {}).get("token_usage") or {}
+    return uso.get("prompt_tokens", 0), uso.get("completion_tokens", 0), 0
+
+
+def _tamanho_saida(output: Any) -> int:
+    conteudo = getattr(output, "content", output)
+    return len(conteudo if isinstance(conteudo, str) else str(conteudo))
+
+
+class MetricasTurno(BaseCallbackHandler):
+    """Coleta os tempos e o consumo de tokens de um turno.
+
+    `executar_agente` atualiza `iteracao` a cada execução do ReAct, de modo que
+    cada chamada ao LLM, tool e recuperação fica associada à iteração externa em
+    que aconteceu.
+    """
+
+    def __init__(self) -> None:
+        self.inicio = time.monotonic()
+        self.iteracao = 0
+        self.llm: list[dict[str, Any]] = []
+        self.tools: list[dict[str, Any]] = []
+        self.recuperacoes: list[dict[str, Any]] = []
+        self._em_andamento: dict[UUID, tuple[float, dict[str, Any]]] = {}
+
+    def _iniciar(self, run_id: UUID, registro: dict[str, Any]) -> None:
+        agora = time.monotonic()
+        self._em_andamento[run_id] = (
+            agora,
+            {"iteracao": self.iteracao, "inicio_s": round(agora - self.inicio, 3), **registro},
+        )
+
+    def _concluir(self, run_id: UUID, destino: list[dict[str, Any]], **dados: Any) -> None:
+        inicio, registro = self._em_andamento.pop(run_id, (None, None))
+        if registro is None:
+            return
+        registro["duracao_s"] = round(time.monotonic() - inicio, 3)
+        registro.update(dados)
+        destino.append(registro)
+
+    def _iniciar_llm(self, serialized: dict[str, Any], run_id: UUID, metadata: dict[str, Any] | None) -> None:
+        metadata = metadata or {}
+        modelo = metadata.get("ls_model_name") or (serialized or {}).get("kwargs", {}).get("model_name")
+        self._iniciar(run_id, {"no": metadata.get("langgraph_node"), "modelo": modelo})
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._iniciar_llm(serialized, run_id, metadata)
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._iniciar_llm(serialized, run_id, metadata)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        entrada, saida, em_cache = _uso_tokens(response)
+        self._concluir(run_id, self.llm, tokens_entrada=entrada, tokens_saida=saida, tokens_em_cache=em_cache)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._concluir(run_id, self.llm, tokens_entrada=0, tokens_saida=0, tokens_em_cache=0, erro=str(error))
+
+    def on_tool_start(self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._iniciar(run_id, {"nome": serialized.get("name", "ferramenta")})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._concluir(run_id, self.tools, caracteres_saida=_tamanho_saida(output))
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._concluir(run_id, self.tools, caracteres_saida=0, erro=str(error))
+
+    def on_retriever_start(self, serialized: dict[str, Any], query: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._iniciar(run_id, {})
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs: Any) -> None:
+        self._concluir(run_id, self.recuperacoes, documentos=len(documents))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._concluir(run_id, self.recuperacoes, documentos=0, erro=str(error))
+
+    def resumo(self, pergunta: str, motivo: str) -> dict[str, Any]:
+        entrada = sum(chamada["tokens_entrada"] for chamada in self.llm)
+        saida = sum(chamada["tokens_saida"] for chamada in self.llm)
+        em_cache = sum(chamada["tokens_em_cache"] for chamada in self.llm)
+        return {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "pergunta": pergunta,
+            "duracao_s": round(time.monotonic() - self.inicio, 3),
+            "iteracoes": self.iteracao,
+            "motivo_parada": motivo,
+            "tokens": {"entrada": entrada, "em_cache": em_cache, "saida": saida, "total": entrada + saida},
+            "llm": self.llm,
+            "tools": self.tools,
+            "recuperacoes": self.recuperacoes,
+        }
+
+
+def registrar_metricas(caminho: Path, metricas: dict[str, Any]) -> None:
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with caminho.open("a", encoding="utf-8") as arquivo:
+        arquivo.write(json.dumps(metricas, ensure_ascii=False) + "\n")
+
+
+def formatar_tabela(metricas: dict[str, Any]) -> str:
+    """Tabela de texto com uma linha por chamada ao LLM, tool e recuperação do turno."""
+    linhas = [("Iter.", "Etapa", "Duração", "Detalhe")]
+    etapas: list[tuple[float, int, str, float, str]] = []
+    for chamada in metricas["llm"]:
+        etapa = f"LLM ({chamada['no']})" if chamada["no"] else "LLM"
+        detalhe = (
+            f"{chamada['tokens_entrada']} entrada ({chamada['tokens_em_cache']} em cache) / "
+            f"{chamada['tokens_saida']} saída"
+        )
+        etapas.append((chamada["inicio_s"], chamada["iteracao"], etapa, chamada["duracao_s"], detalhe))
+    for tool in metricas["tools"]:
+        detalhe = f"{tool['caracteres_saida']} caracteres" + (" (erro)" if "erro" in tool else "")
+        etapas.append((tool["inicio_s"], tool["iteracao"], f"tool {tool['nome']}", tool["duracao_s"], detalhe))
+    for rec in metricas["recuperacoes"]:
+        detalhe = f"{rec['documentos']} documentos"
+        etapas.append((rec["inicio_s"], rec["iteracao"], "recuperação", rec["duracao_s"], detalhe))
+    for _, iteracao, etapa, duracao, detalhe in sorted(etapas, key=lambda etapa: etapa[0]):
+        linhas.append((str(iteracao), etapa, f"{duracao:.2f} s", detalhe))
+    tokens = metricas["tokens"]
+    linhas.append((
+        "", "Total", f"{metricas['duracao_s']:.2f} s",
+        f"{tokens['entrada']} entrada ({tokens['em_cache']} em cache) / {tokens['saida']} saída "
+        f"({metricas['motivo_parada']})",
+    ))
+    larguras = [max(len(linha[coluna]) for linha in linhas) for coluna in range(4)]
+    texto = [
+        "  ".join(celula.ljust(larguras[coluna]) for coluna, celula in enumerate(linha)).rstrip()
+        for linha in linhas
+    ]
+    texto.insert(1, "  ".join("-" * largura for largura in larguras))
+    texto.insert(-1, texto[1])
+    return "[Métricas do turno]\n" + "\n".join(texto)
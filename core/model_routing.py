@@ -0,0 +1,37 @@
+"""Escolha do modelo do agente por turno: turnos simples vão para um modelo mais rápido."""
+from __future__ import annotations
+
+import re
+from typing import Any, TypedDict
+
+from langchain_core.language_models import BaseChatModel
+from langgraph.runtime import Runtime
+
+# Pedidos que geram ou alteram artefatos pedem o modelo principal mesmo quando curtos.
+_TERMOS_COMPLEXOS = re.compile(
+    r"\b(ger[ae]\w*|escrev\w*|cri[ae]\w*|implement\w*|migr\w*|refator\w*|plane\w*|corri[gj]\w*"
+    r"|alter\w*|atualiz\w*|compar\w*|analis\w*|revis\w*)\b",
+    re.IGNORECASE,
+)
+
+
+class ContextoModelo(TypedDict, total=False):
+    rapido: bool  # usa o modelo rápido no turno atual
+
+
+def turno_simples(pergunta: str, confirmacao: bool, max_caracteres: int) -> bool:
+    """Confirmações e consultas curtas que não pedem geração ou alteração de código."""
+    if confirmacao:
+        return True
+    texto = pergunta.strip()
+    return len(texto) <= max_caracteres and not _TERMOS_COMPLEXOS.search(texto)
+
+
+def seletor_de_modelo(principal: BaseChatModel, rapido: BaseChatModel, tools: list[Any]):
+    """Modelo dinâmico do create_react_agent, decidido pelo contexto `rapido` da execução."""
+    modelos = {False: principal.bind_tools(tools), True: rapido.bind_tools(tools)}
+
+    def selecionar(_: Any, runtime: Runtime[ContextoModelo]):
+        return modelos[bool((runtime.context or {}).get("rapido"))]
+
+    return selecionar
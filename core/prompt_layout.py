@@ -0,0 +1,66 @@
+"""Montagem do prompt do agente da parte mais estável para a mais volátil.
+
+Provedores como a OpenAI reaproveitam o processamento do maior prefixo já
+visto de um prompt. Por isso a ordem é: system prompt (fixo, inserido pelo
+create_react_agent), resumo da conversa (muda só quando a memória é
+compactada), histórico (cresce apenas no final) e, por último, o contexto do
+turno e a nova pergunta.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+
+def montar_mensagens(
+    resumo: str | None,
+    historico: list[BaseMessage],
+    contexto_turno: list[str],
+    pergunta: str,
+) -> list[BaseMessage]:
+    mensagens: list[BaseMessage] = []
+    if resumo:
+        mensagens.append(SystemMessage(content=f"Resumo da conversa anterior:\n{resumo}"))
+    mensagens.extend(historico)
+    if contexto_turno:
+        mensagens.append(SystemMessage(content=" | ".join(contexto_turno)))
+    mensagens.append(HumanMessage(content=pergunta))
+    return mensagens
+
+
+class UsoCachePrompt(BaseCallbackHandler):
+    """Registra, por chamada ao LLM, quantos tokens de entrada vieram do cache do provedor."""
+
+    def __init__(self) -> None:
+        # (tokens de entrada, tokens de entrada em cache) por chamada
+        self.chamadas: list[tuple[int, int]] = []
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        for geracoes in response.generations:
+            for geracao in geracoes:
+                uso = getattr(getattr(geracao, "message", None), "usage_metadata", None)
+                if uso:
+                    detalhes = uso.get("input_token_details") or {}
+                    self.chamadas.append((uso.get("input_tokens", 0), detalhes.get("cache_read", 0) or 0))
+                    return
+
+    @property
+    def tokens_entrada(self) -> int:
+        return sum(entrada for entrada, _ in self.chamadas)
+
+    @property
+    def tokens_em_cache(self) -> int:
+        return sum(cache for _, cache in self.chamadas)
+
+    def formatar(self) -> str:
+        total = self.tokens_entrada
+        em_cache = self.tokens_em_cache
+        taxa = em_cache / total if total else 0.0
+        por_chamada = ", ".join(f"{cache}/{entrada}" for entrada, cache in self.chamadas)
+        return (
+            f"[Cache de prompt] {len(self.chamadas)} chamada(s): {em_cache} de {total} tokens "
+            f"de entrada em cache ({taxa:.0%}), {total - em_cache} sem cache "
+            f"[em cache/total por chamada: {por_chamada}]."
+        )
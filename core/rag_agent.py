@@ -1,21 +1,51 @@
+import logging
 import os
+from uuid import uuid4
 from typing import Any, Tuple, TypedDict
 
 from langchain_classic.chains import ConversationalRetrievalChain
-from langchain_chroma import Chroma
-from langchain_core.callbacks import BaseCallbackHandler
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_classic.chains.conversational_retrieval.base import _get_chat_history
+from langchain_core.caches import BaseCache
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import tool
+from langgraph.config import get_config
 from langgraph.graph import StateGraph
 from langgraph.prebuilt import create_react_agent
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
+from pydantic import Field
 
 from . import config
 from . import tools
+from .answer_cache import criar_cache_respostas
+from .budget import (
+    MENSAGEM_PASSOS_ESGOTADOS,
+    DecisaoParada,
+    OrcamentoEsgotado,
+    OrcamentoTurno,
+    decidir_parada,
+    melhor_resposta,
+)
+from .embedding_cache import criar_embeddings_consulta
+from .hybrid_retrieval import RecuperadorHibrido
+from .ingestion import abrir_vector_store, estado_indice
+from .lexical_index import abrir_indice_lexico
+from .llm_cache import obter_cache_llm
+from .memory import MemoriaConversa, historico_rag
+from .metrics import MetricasTurno, registrar_metricas
+from .model_routing import ContextoModelo, seletor_de_modelo, turno_simples
+from .prompt_layout import UsoCachePrompt, montar_mensagens
+from .read_cache import LeiturasTurno
+from .streaming import EncaminhadorEventos
+from .tracing import RastreadorExecucao, registrar_evento
 
 
 class LegacyChatOpenAI(ChatOpenAI):
+    # Todas as instâncias compartilham o cache de respostas configurado em
+    # `llmCache` (None quando desligado).
+    cache: BaseCache | bool | None = Field(default_factory=obter_cache_llm, exclude=True)
+
     @staticmethod
     def _merge_callback_config(config: RunnableConfig | None, callbacks: Any | None) -> RunnableConfig | None:
         if callbacks is None:
@@ -39,34 +69,6 @@ class LegacyChatOpenAI(ChatOpenAI):
         return await super().ainvoke(input, config=config, stop=stop, **kwargs)
 
 
-class TerminalCallbackHandler(BaseCallbackHandler):
-    def on_llm_start(self, serialized, prompts, **kwargs):
-        print("[Agente] Consultando LLM...", flush=True)
-        print("🟡 Prompt enviado ao LLM:")
-        for i, prompt in enumerate(prompts):
-            print(f"--- Prompt {i+1} ---")
-            print(prompt)
-            print("-" * 40)
-
-    def on_llm_end(self, response, **kwargs):
-        print("[Agente] LLM respondeu.", flush=True)
-        print("🟢 Resposta recebida do LLM:")
-        try:
-            for gen in response.generations:
-                print(gen[0].text.strip())
-        except Exception:
-            print(response)
-
-    def on_tool_start(self, serialized, input_str, **kwargs):
-        nome = serialized.get("name", "ferramenta")
-        print(f"[Agente] Executando tool '{nome}'...", flush=True)
-        print(f"🛠️ Entrada da tool: {input_str}")
-
-    def on_tool_end(self, output, **kwargs):
-        print("✅ Tool concluída. Saída:")
-        print(output)
-
-
 def _carregar_system_prompt() -> str:
     if not config.SYSTEM_PROMPT_FILE.is_file():
         raise FileNotFoundError(f"Arquivo de system prompt não encontrado em '{config.SYSTEM_PROMPT_FILE}'.")
@@ -96,45 +98,138 @@ def _obter_limite_agente(variavel: str, padrao: int) -> int:
     return convertido if convertido > 0 else padrao
 
 
-def build_rag_chain(rag_history: list[tuple[str, str]]) -> ConversationalRetrievalChain:
-    embeddings = OpenAIEmbeddings()
-    vector_store = Chroma(persist_directory=str(config.DB_DIR), embedding_function=embeddings)
-    retriever = vector_store.as_retriever(search_kwargs={"k": 4})
-    llm = LegacyChatOpenAI(model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), temperature=0)
+def build_rag_chain() -> ConversationalRetrievalChain:
+    vector_store = abrir_vector_store(criar_embeddings_consulta())
+    indice_lexico = abrir_indice_lexico()
+    if indice_lexico is not None:
+        retriever = RecuperadorHibrido(
+            vectorstore=vector_store,
+            indice=indice_lexico,
+            k=4,
+            candidatos=config.HYBRID_SEARCH_CANDIDATES,
+            rrf_k=config.HYBRID_SEARCH_RRF_K,
+            atalho_lexico=config.HYBRID_SEARCH_LEXICAL_FAST_PATH,
+        )
+    else:
+        retriever = vector_store.as_retriever(search_kwargs={"k": 4})
     return ConversationalRetrievalChain.from_llm(
-        llm=llm,
+        llm=LegacyChatOpenAI(model=config.MODEL_RAG_ANSWER, temperature=0),
         retriever=retriever,
+        condense_question_llm=LegacyChatOpenAI(model=config.MODEL_CONDENSE_QUESTION, temperature=0),
         return_source_documents=True,
     )
 
 
-def build_react_agent(rag_history: list[tuple[str, str]]):
-    rag_chain = build_rag_chain(rag_history)
+def _formatar_trechos(documentos: list[Document]) -> str:
+    if not documentos:
+        return "Nenhum trecho relevante foi encontrado na documentação indexada."
+    blocos: list[str] = []
+    for indice, doc in enumerate(documentos, start=1):
+        conteudo = doc.page_content.strip()
+        if len(conteudo) > config.RAG_MAX_CHUNK_CHARACTERS:
+            conteudo = conteudo[: config.RAG_MAX_CHUNK_CHARACTERS] + "\n[...]"
+        fonte = doc.metadata.get("source", "desconhecido")
+        blocos.append(f"[{indice}] Fonte: {fonte}\n{conteudo}")
+    return "\n\n".join(blocos)
+
+
+def _condensar_pergunta(
+    rag_chain: ConversationalRetrievalChain, pergunta: str, historico: list[tuple[str, str]]
+) -> str:
+    """Reescreve a pergunta a partir do histórico, como a chain faria internamente."""
+    formatar_historico = rag_chain.get_chat_history or _get_chat_history
+    gerador = rag_chain.question_generator
+    resultado = gerador.invoke({"question": pergunta, "chat_history": formatar_historico(historico)})
+    return resultado[gerador.output_key]
+
+
+def build_react_agent():
+    rag_chain = build_rag_chain()
+    cache_respostas = criar_cache_respostas(rag_chain.retriever, config.RAG_MODE)
 
     @tool("consultar_documentacao")
     def consultar_documentacao(pergunta: str) -> str:
         """Consulta a base RAG usando o histórico atual e devolve fontes."""
-        resultado = rag_chain.invoke({"question": pergunta, "chat_history": rag_history})
-        fontes = resultado.get("source_documents", [])
-        referencias = "\n".join(sorted({doc.metadata.get("source", "desconhecido") for doc in fontes}))
-        if referencias:
-            return f"{resultado['answer']}\n\nFontes:\n{referencias}"
-        return resultado["answer"]
+        # No modo "direta" a pergunta da tool já é autocontida; sem histórico,
+        # a chain pula a etapa de reescrita da pergunta (uma chamada a menos).
+        historico = []
+        if config.RAG_MODE == "conversacional":
+            # Histórico da sessão em andamento, repassado por executar_agente.
+            historico = get_config().get("configurable", {}).get("historico_rag", [])
+        if historico:
+            # A reescrita é feita aqui e não dentro da chain: a pergunta autocontida
+            # ("e o segundo endpoint?" -> "Qual é o segundo endpoint da emissão?")
+            # é a chave do cache e segue para a chain já sem histórico.
+            pergunta = _condensar_pergunta(rag_chain, pergunta, historico)
+        # Lido antes da consulta: se a base mudar durante ela, a resposta fica
+        # registrada com o estado antigo e é descartada na próxima leitura.
+        estado = estado_indice()
+        vetor_pergunta = None
+        if cache_respostas is not None:
+            em_cache, vetor_pergunta = cache_respostas.obter(pergunta, estado)
+            if em_cache is not None:
+                registrar_evento(logging.INFO, "resposta_em_cache", pergunta=pergunta)
+                return em_cache
+        if config.RAG_MODE == "trechos":
+            # Sem chamada ao LLM: o agente recebe os trechos e redige a resposta ele mesmo.
+            documentos = rag_chain.retriever.invoke(pergunta)
+            resposta = _formatar_trechos(documentos)
+        else:
+            resultado = rag_chain.invoke({"question": pergunta, "chat_history": []})
+            documentos = resultado.get("source_documents", [])
+            referencias = "\n".join(sorted({doc.metadata.get("source", "desconhecido") for doc in documentos}))
+            resposta = resultado["answer"]
+            if referencias:
+                resposta = f"{resposta}\n\nFontes:\n{referencias}"
+        if cache_respostas is not None:
+            fontes = {doc.metadata.get("source", "desconhecido") for doc in documentos}
+            cache_respostas.gravar(pergunta, estado, resposta, fontes, vetor_pergunta)
+        return resposta
 
     @tool("buscar_arquivos")
     def buscar_arquivos_tool(projeto: str, filtro: str) -> str:
         """Busca arquivos por nome dentro do projeto pedido."""
         return tools.buscar_arquivos(projeto, filtro)
 
+    @tool("buscar_conteudo")
+    def buscar_conteudo_tool(projeto: str, texto: str) -> str:
+        """
+        Procura um texto (nome de endpoint, procedure, componente...) dentro dos
+        arquivos do projeto e devolve as linhas encontradas como caminho:linha: trecho.
+        """
+        return tools.buscar_conteudo(projeto, texto)
+
     @tool("ler_arquivo")
-    def ler_arquivo_tool(caminho: str) -> str:
-        """Retorna o conteúdo (ou erro) do arquivo informado."""
-        return tools.ler_arquivo(caminho)
+    def ler_arquivo_tool(
+        caminho: str,
+        linha_inicial: int | None = None,
+        quantidade_linhas: int | None = None,
+        byte_inicial: int | None = None,
+        continuar: str | None = None,
+    ) -> str:
+        """
+        Retorna o conteúdo (ou erro) do arquivo informado. Arquivos grandes vêm em
+        páginas com cabeçalho (linhas, total de linhas, codificação); para a página
+        seguinte, passe em `continuar` o token indicado no fim da resposta. Use
+        `linha_inicial`/`quantidade_linhas` (ou `byte_inicial`) para ler só o trecho necessário.
+        """
+        def ler() -> str:
+            return tools.ler_arquivo(caminho, linha_inicial, quantidade_linhas, byte_inicial, continuar)
+
+        # Registro das leituras do turno em andamento, repassado por executar_agente.
+        leituras = get_config().get("configurable", {}).get("leituras")
+        if leituras is None:
+            return ler()
+        return leituras.ler(caminho, (linha_inicial, quantidade_linhas, byte_inicial, continuar), ler)
 
     @tool("escrever_arquivo")
     def escrever_arquivo_tool(caminho: str, conteudo: str) -> str:
         """Substitui o conteúdo de um arquivo e registra a alteração."""
-        return tools.escrever_arquivo(caminho, conteudo)
+        resultado = tools.escrever_arquivo(caminho, conteudo)
+        leituras = get_config().get("configurable", {}).get("leituras")
+        if leituras is not None:
+            leituras.invalidar(caminho)
+        return resultado
 
     @tool("criar_ou_atualizar_plano")
     def criar_ou_atualizar_plano_tool(projeto: str, nome_plano: str, conteudo: str) -> str:
@@ -172,6 +267,7 @@ def build_react_agent(rag_history: list[tuple[str, str]]):
     agent_tools = [
         consultar_documentacao,
         buscar_arquivos_tool,
+        buscar_conteudo_tool,
         ler_arquivo_tool,
         escrever_arquivo_tool,
         criar_ou_atualizar_plano_tool,
@@ -179,18 +275,33 @@ def build_react_agent(rag_history: list[tuple[str, str]]):
         listar_projetos_configurados_tool,
     ]
 
-    # def _react_model(_: Any, __: Any) -> LegacyChatOpenAI:
-    #     return LegacyChatOpenAI(model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), temperature=0)
-    
-    llm = LegacyChatOpenAI(model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), temperature=0)
+    # Com streaming os tokens chegam aos callbacks assim que gerados;
+    # stream_usage mantém a contagem de tokens usada pelos orçamentos do turno.
+    llm = LegacyChatOpenAI(
+        model=config.MODEL_AGENT,
+        temperature=0,
+        streaming=True,
+        stream_usage=True,
+    )
+    modelo: Any = llm
+    if config.MODEL_ROUTER_ENABLED:
+        llm_rapido = LegacyChatOpenAI(
+            model=config.MODEL_ROUTER_FAST_MODEL,
+            temperature=0,
+            streaming=True,
+            stream_usage=True,
+        )
+        modelo = seletor_de_modelo(llm, llm_rapido, agent_tools)
 
     agent = create_react_agent(
-        # model=_react_model,
-        model=llm,
+        model=modelo,
         tools=agent_tools,
         prompt=SYSTEM_PROMPT,
         version="v2",
         name="agente_certidao",
+        context_schema=ContextoModelo,
+        # O agente interno roda a cada turno do zero; só o grafo externo é salvo por sessão.
+        checkpointer=False,
     )
     return agent
 
@@ -208,6 +319,8 @@ class AgentState(TypedDict):
     implementado_frontend: str | None
     endpoints_backend: str | None
     regras_negocio: str | None
+    resumo_conversa: str | None  # resumo incremental dos turnos que saíram do histórico
+    metricas: dict | None  # tempos e tokens do último turno (ver core/metrics.py)
 
 
 
@@ -215,17 +328,47 @@ from langgraph.graph import StateGraph
 
 LangGraph = StateGraph
 
-def build_graph_agent(rag_history: list[tuple[str, str]]) -> LangGraph:
-    react_agent = build_react_agent(rag_history)
+def build_graph_agent(checkpointer: Any = None) -> LangGraph:
+    react_agent = build_react_agent()
     max_iterations = _obter_limite_agente(
         "AGENT_MAX_ITERATIONS", config.AGENT_MAX_ITERATIONS
     )
+    max_execution_time = _obter_limite_agente(
+        "AGENT_MAX_EXECUTION_TIME", config.AGENT_MAX_EXECUTION_TIME
+    )
+    max_tokens_turno = _obter_limite_agente(
+        "AGENT_MAX_TOKENS_PER_TURN", config.AGENT_MAX_TOKENS_PER_TURN
+    )
+    max_chamadas_turno = _obter_limite_agente(
+        "AGENT_MAX_LLM_CALLS_PER_TURN", config.AGENT_MAX_LLM_CALLS_PER_TURN
+    )
+    memoria = MemoriaConversa(
+        LegacyChatOpenAI(model=config.MODEL_SUMMARY, temperature=0),
+        modelo=config.MODEL_AGENT,
+        max_tokens=config.MEMORY_MAX_HISTORY_TOKENS,
+        turnos_recentes=config.MEMORY_RECENT_TURNS,
+        max_tokens_resumo=config.MEMORY_SUMMARY_MAX_TOKENS,
+    )
 
     def executar_agente(state: AgentState) -> AgentState:
         pergunta = state["input"]
-        callback_handler = TerminalCallbackHandler()
+        rastreador = RastreadorExecucao(turno=uuid4().hex[:12])
+        orcamento = OrcamentoTurno(
+            max_segundos=max_execution_time,
+            max_tokens=max_tokens_turno,
+            max_chamadas=max_chamadas_turno,
+        )
+        uso_cache_prompt = UsoCachePrompt()
+        metricas = MetricasTurno()
+        callbacks = [rastreador, orcamento, uso_cache_prompt, metricas]
+        # Quem invoca o grafo pode receber tokens e progresso das tools via
+        # config={"configurable": {"ao_evento": callable}}.
+        ao_evento = get_config().get("configurable", {}).get("ao_evento")
+        if ao_evento is not None:
+            callbacks.append(EncaminhadorEventos(ao_evento))
         current_state = state.copy()
         historico = current_state.get("history") or []
+        resumo = current_state.get("resumo_conversa")
         contador = current_state.get("__contador__", 0)
         encerrar = False
 
@@ -241,14 +384,6 @@ def build_graph_agent(rag_history: list[tuple[str, str]]) -> LangGraph:
             ("regras_negocio", "Regras de negócio"),
         ]
 
-        gatilhos_fim = [
-            "planejamento concluído",
-            "decisão registrada",
-            "documentação finalizada",
-            "etapa concluída",
-            "tudo pronto",
-        ]
-
         confirmacoes = {
             "sim",
             "sim.",
@@ -259,75 +394,118 @@ def build_graph_agent(rag_history: list[tuple[str, str]]) -> LangGraph:
             "prossiga",
         }
 
-        while not encerrar and contador < max_iterations:
-            confirmacao = pergunta.strip().lower() in confirmacoes
-
-            ultimo_ai: AIMessage | None = None
-            for msg in reversed(historico):
-                if isinstance(msg, AIMessage):
-                    ultimo_ai = msg
-                    break
-
-            context_parts: list[str] = []
-            for field, label in field_labels:
-                valor = current_state.get(field)
-                if valor:
-                    context_parts.append(f"{label}: {valor}")
-
-            if confirmacao and ultimo_ai:
-                ultima_pergunta = ultimo_ai.content.strip()
-                if ultima_pergunta.endswith("?") or "?" in ultima_pergunta:
-                    context_parts.append("Confirmação do usuário: aceitou a última sugestão do agente.")
-
-            mensagens = historico.copy()
-            if context_parts:
-                mensagens.insert(0, SystemMessage(content=" | ".join(context_parts)))
-            mensagens.append(HumanMessage(content=pergunta))
-
-            resultado = react_agent.invoke(
-                {"messages": mensagens, "remaining_steps": max_iterations},
-                config={"callbacks": [callback_handler]},
-            )
+        confirmacao = pergunta.strip().lower() in confirmacoes
 
-            mensagens_resultado = resultado.get("messages", [])
-            ultima_resposta = next(
-                (m for m in reversed(mensagens_resultado) if isinstance(m, AIMessage)), None
-            )
-            answer = ultima_resposta.content if ultima_resposta else ""
+        ultimo_ai: AIMessage | None = None
+        for msg in reversed(historico):
+            if isinstance(msg, AIMessage):
+                ultimo_ai = msg
+                break
 
-            novo_historico = historico.copy()
-            novo_historico.append(HumanMessage(content=pergunta))
-            if ultima_resposta:
-                novo_historico.append(ultima_resposta)
+        context_parts: list[str] = []
+        for field, label in field_labels:
+            valor = current_state.get(field)
+            if valor:
+                context_parts.append(f"{label}: {valor}")
 
-            rag_history.append((pergunta, answer))
+        rapido = config.MODEL_ROUTER_ENABLED and turno_simples(
+            pergunta, confirmacao, config.MODEL_ROUTER_MAX_QUESTION_CHARACTERS
+        )
+        rastreador.evento(
+            logging.INFO,
+            "modelo_turno",
+            modelo=config.MODEL_ROUTER_FAST_MODEL if rapido else config.MODEL_AGENT,
+        )
 
-            resposta_normalizada = answer.lower()
-            if any(frase in resposta_normalizada for frase in gatilhos_fim):
-                encerrar = True
+        if confirmacao and ultimo_ai:
+            ultima_pergunta = ultimo_ai.content.strip()
+            if ultima_pergunta.endswith("?") or "?" in ultima_pergunta:
+                context_parts.append("Confirmação do usuário: aceitou a última sugestão do agente.")
+
+        # O histórico do RAG só serve para reescrever a pergunta; os turnos recentes bastam.
+        configurable = {"historico_rag": historico_rag(historico, config.MEMORY_RAG_HISTORY_TURNS)}
+        leituras = LeiturasTurno() if config.READ_CACHE_ENABLED else None
+        if leituras is not None:
+            configurable["leituras"] = leituras
+
+        mensagens: list[BaseMessage] = []
+        ultima_resposta: AIMessage | None = None
+        decisao = DecisaoParada(False, "inicio")
+        while not encerrar:
+            interrompido: OrcamentoEsgotado | None = None
+            metricas.iteracao = contador + 1
+            try:
+                if not mensagens:
+                    historico, resumo = memoria.compactar(
+                        historico, resumo, config={"callbacks": callbacks}
+                    )
+                    mensagens = montar_mensagens(resumo, historico, context_parts, pergunta)
+                mensagens_resultado = mensagens
+                # "values" entrega o estado após cada passo: se o orçamento acabar no
+                # meio da execução, o que já foi produzido não se perde.
+                for estado in react_agent.stream(
+                    {"messages": mensagens, "remaining_steps": max_iterations},
+                    config={"callbacks": callbacks, "configurable": configurable},
+                    context={"rapido": rapido},
+                    stream_mode="values",
+                ):
+                    mensagens_resultado = estado.get("messages", mensagens_resultado)
+            except OrcamentoEsgotado as exc:
+                interrompido = exc
 
             contador += 1
-            if contador >= max_iterations:
-                encerrar = True
-
-            historico = novo_historico
-            current_state = {
-                **current_state,
-                "answer": answer,
-                "history": historico,
-                "__contador__": contador,
-                "encerrar": encerrar,
-            }
-
-            print(f"[DEBUG] Iteração {contador} – Encerrar? {encerrar}", flush=True)
+            novas = mensagens_resultado[len(mensagens):]
+            ultima_resposta = melhor_resposta(novas) or ultima_resposta
+            decisao = decidir_parada(novas, orcamento, contador, max_iterations, interrompido)
+            encerrar = decisao.encerrar
+            # Passos do grafo esgotados: a próxima execução continua a partir das
+            # mensagens e resultados de ferramentas já obtidos, sem repetir o trabalho.
+            mensagens = [
+                m for m in mensagens_resultado
+                if not (isinstance(m, AIMessage) and m.text == MENSAGEM_PASSOS_ESGOTADOS)
+            ]
+
+            rastreador.evento(
+                logging.DEBUG, "iteracao", iteracao=contador, encerrar=encerrar, motivo=decisao.motivo
+            )
 
-            if encerrar:
-                break
+        if leituras is not None and leituras.repetidas:
+            rastreador.evento(
+                logging.INFO, "leituras_repetidas", leituras=leituras.total, repetidas=leituras.repetidas
+            )
+        if uso_cache_prompt.chamadas:
+            rastreador.evento(logging.INFO, "cache_prompt", resumo=uso_cache_prompt.formatar())
+
+        answer = ultima_resposta.text if ultima_resposta else ""
+        if decisao.motivo != "resposta_final":
+            aviso = f"(Execução interrompida: {decisao.descricao}.)"
+            answer = f"{answer}\n\n{aviso}" if answer else (
+                f"Não consegui concluir a solicitação dentro dos limites do turno. {aviso}"
+            )
 
+        resumo_metricas = metricas.resumo(pergunta, decisao.motivo)
+        if config.METRICS_ENABLED:
+            registrar_metricas(config.METRICS_FILE, resumo_metricas)
+
+        novo_historico = historico.copy()
+        novo_historico.append(HumanMessage(content=pergunta))
+        novo_historico.append(AIMessage(content=answer))
+
+        current_state = {
+            **current_state,
+            "answer": answer,
+            "history": novo_historico,
+            "resumo_conversa": resumo,
+            "metricas": resumo_metricas,
+            "__contador__": contador,
+            "encerrar": encerrar,
+        }
         return current_state
 
     graph = StateGraph(AgentState)
     graph.add_node("executar_agente", executar_agente)
     graph.set_entry_point("executar_agente")
 
-    return graph.compile()
+    # Com checkpointer, o estado de cada thread_id (histórico, resumo e campos
+    # do contexto) é salvo ao fim de cada turno e pode ser retomado depois.
+    return graph.compile(checkpointer=checkpointer)
@@ -0,0 +1,58 @@
+"""Leituras de arquivo de um turno: reler um arquivo inalterado devolve só uma referência.
+
+As mensagens de um turno se acumulam entre as iterações de `executar_agente`,
+então o texto de uma leitura anterior continua visível para o modelo até o fim
+do turno. Reenviar o mesmo conteúdo só aumenta o prompt; por isso cada leitura
+recebe um número e uma releitura do mesmo trecho, com mtime e tamanho iguais,
+responde apenas com o número da leitura original.
+"""
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+
+class LeiturasTurno:
+    """Registro das leituras de `ler_arquivo` feitas durante um turno."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # (caminho, intervalo pedido) -> ((mtime_ns, tamanho), número da leitura)
+        self._leituras: dict[tuple[Any, ...], tuple[tuple[int, int], int]] = {}
+        self.total = 0
+        self.repetidas = 0
+
+    def ler(self, caminho: str, intervalo: tuple[Any, ...], leitor: Callable[[], str]) -> str:
+        """Executa `leitor` ou, se o mesmo trecho já foi lido e não mudou, devolve a referência."""
+        caminho_real = Path(caminho).expanduser().resolve()
+        try:
+            estado = caminho_real.stat()
+        except OSError:
+            return leitor()  # a própria tool descreve o erro
+        chave = (str(caminho_real), *intervalo)
+        versao = (estado.st_mtime_ns, estado.st_size)
+        with self._lock:
+            anterior = self._leituras.get(chave)
+            if anterior is not None and anterior[0] == versao:
+                self.repetidas += 1
+                return (
+                    f"[Leitura #{anterior[1]} repetida] O arquivo '{caminho_real}' não mudou desde a "
+                    f"leitura #{anterior[1]} deste turno; use o conteúdo já retornado nela."
+                )
+
+        resultado = leitor()
+        if resultado.startswith("Erro:"):
+            return resultado
+        with self._lock:
+            self.total += 1
+            self._leituras[chave] = (versao, self.total)
+            numero = self.total
+        return f"[Leitura #{numero}]\n{resultado}"
+
+    def invalidar(self, caminho: str) -> None:
+        """Descarta as leituras do arquivo, em qualquer intervalo (chamado após escrevê-lo)."""
+        alvo = str(Path(caminho).expanduser().resolve())
+        with self._lock:
+            for chave in [chave for chave in self._leituras if chave[0] == alvo]:
+                del self._leituras[chave]
@@ -0,0 +1,29 @@
+"""Sessões persistentes do agente: checkpoints do grafo em SQLite, por thread."""
+from __future__ import annotations
+
+import sqlite3
+from typing import Any
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from . import config
+
+
+def abrir_checkpointer() -> SqliteSaver | None:
+    if not config.SESSIONS_ENABLED:
+        return None
+    config.SESSIONS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    # O SqliteSaver serializa o acesso com um lock próprio.
+    conexao = sqlite3.connect(str(config.SESSIONS_FILE), check_same_thread=False)
+    conexao.execute("PRAGMA journal_mode=WAL")
+    return SqliteSaver(conexao)
+
+
+def config_sessao(sessao: str, **configurable: Any) -> dict[str, Any]:
+    return {"configurable": {"thread_id": sessao, **configurable}}
+
+
+def estado_da_sessao(graph_app, sessao: str) -> dict[str, Any]:
+    """Último estado salvo da sessão, ou `{}` se ela ainda não existe."""
+    return dict(graph_app.get_state(config_sessao(sessao)).values)
+
@@ -0,0 +1,81 @@
+"""Encaminhamento de tokens e do progresso das tools para a CLI e o servidor."""
+from __future__ import annotations
+
+from typing import Any, Callable
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+
+# Eventos entregues ao destino:
+#   {"tipo": "token", "execucao": str, "conteudo": str}
+#   {"tipo": "tool_inicio", "nome": str, "entrada": str}
+#   {"tipo": "tool_fim", "nome": str}
+#   {"tipo": "tool_erro", "nome": str, "erro": str}
+DestinoEventos = Callable[[dict[str, Any]], None]
+
+# Nó do create_react_agent que gera as respostas do agente; tokens de outros
+# LLMs (RAG dentro das tools, resumo da memória) não são encaminhados.
+NO_AGENTE = "agent"
+
+
+class EncaminhadorEventos(BaseCallbackHandler):
+    def __init__(self, destino: DestinoEventos) -> None:
+        self.destino = destino
+        self._execucoes_agente: set[UUID] = set()
+        self._tools: dict[UUID, str] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        if (metadata or {}).get("langgraph_node") == NO_AGENTE:
+            self._execucoes_agente.add(run_id)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if token and run_id in self._execucoes_agente:
+            self.destino({"tipo": "token", "execucao": str(run_id), "conteudo": token})
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._execucoes_agente.discard(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._execucoes_agente.discard(run_id)
+
+    def on_tool_start(self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        nome = serialized.get("name", "ferramenta")
+        self._tools[run_id] = nome
+        self.destino({"tipo": "tool_inicio", "nome": nome, "entrada": input_str})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self.destino({"tipo": "tool_fim", "nome": self._tools.pop(run_id, "ferramenta")})
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.destino(
+            {"tipo": "tool_erro", "nome": self._tools.pop(run_id, "ferramenta"), "erro": str(error)}
+        )
+
+
+class TextoTransmitido:
+    """Acompanha o texto já exibido da última resposta transmitida do agente."""
+
+    def __init__(self) -> None:
+        self.execucao: str | None = None
+        self.texto = ""
+
+    def registrar(self, evento: dict[str, Any]) -> None:
+        if evento["execucao"] != self.execucao:
+            self.execucao = evento["execucao"]
+            self.texto = ""
+        self.texto += evento["conteudo"]
+
+    def restante(self, resposta: str) -> str | None:
+        """Parte da resposta final ainda não exibida, ou `None` se ela não foi transmitida."""
+        if self.texto and resposta.startswith(self.texto):
+            return resposta[len(self.texto):]
+        return None
@@ -3,6 +3,9 @@ from pathlib import Path
 from typing import List, Tuple
 
 from . import config
+from .content_index import indice_conteudo
+from .file_index import indice_nomes
+from .file_reader import LeituraInvalidaError, ler_trecho
 from .utils import (
     eh_backend,
     identificar_contexto,
@@ -11,25 +14,56 @@ from .utils import (
 )
 
 
-def ler_arquivo(caminho: str) -> str:
+def ler_arquivo(
+    caminho: str,
+    linha_inicial: int | None = None,
+    quantidade_linhas: int | None = None,
+    byte_inicial: int | None = None,
+    continuar: str | None = None,
+) -> str:
+    """
+    Lê um arquivo inteiro ou um trecho dele.
+
+    Arquivos pequenos lidos sem intervalo voltam como antes, sem cabeçalho.
+    Os demais são devolvidos em páginas de até `MAX_ARQUIVO_CARACTERES` bytes
+    com um cabeçalho (linhas, total de linhas, bytes e codificação) e, se houver
+    mais conteúdo, o token a ser passado em `continuar` para a página seguinte.
+    """
     if not caminho:
         return "Erro: nenhum caminho informado."
     caminho_real = Path(caminho).expanduser()
     if not caminho_real.is_file():
         return f"Erro: o arquivo '{caminho_real}' não existe."
     try:
-        conteudo = caminho_real.read_text(encoding="utf-8")
-    except UnicodeDecodeError:
-        return f"Erro: não foi possível decodificar '{caminho_real}' como UTF-8."
-    if len(conteudo) > config.MAX_ARQUIVO_CARACTERES:
-        trecho = conteudo[: config.MAX_ARQUIVO_CARACTERES]
-        aviso = (
-            f"Arquivo '{caminho_real}' possui {len(conteudo)} caracteres; "
-            f"retornando apenas os primeiros {config.MAX_ARQUIVO_CARACTERES}. "
-            "Solicite trechos específicos se precisar do restante."
+        trecho = ler_trecho(
+            caminho_real,
+            config.MAX_ARQUIVO_CARACTERES,
+            linha_inicial=linha_inicial,
+            quantidade_linhas=quantidade_linhas,
+            byte_inicial=byte_inicial,
+            continuacao=continuar,
         )
-        return f"{aviso}\n\n{trecho}"
-    return conteudo
+    except LeituraInvalidaError as exc:
+        return f"Erro: não foi possível ler '{caminho_real}': {exc}"
+    except OSError as exc:
+        return f"Erro: falha ao ler '{caminho_real}': {exc.strerror}"
+
+    pediu_intervalo = any(
+        valor is not None for valor in (linha_inicial, quantidade_linhas, byte_inicial, continuar)
+    )
+    if trecho.arquivo_inteiro and not pediu_intervalo:
+        return trecho.texto
+    cabecalho = (
+        f"[Arquivo '{caminho_real}' | linhas {trecho.linha_inicial}-{trecho.linha_final} "
+        f"de {trecho.total_linhas} | bytes {trecho.byte_inicial}-{trecho.byte_final} "
+        f"de {trecho.tamanho} | {trecho.codificacao}]"
+    )
+    resposta = f"{cabecalho}\n{trecho.texto}"
+    if trecho.continuacao:
+        if not resposta.endswith("\n"):
+            resposta += "\n"
+        resposta += f"[Continua: chame ler_arquivo com continuar='{trecho.continuacao}']"
+    return resposta
 
 
 def escrever_arquivo(caminho: str, conteudo: str) -> str:
@@ -42,34 +76,29 @@ def escrever_arquivo(caminho: str, conteudo: str) -> str:
     return conteudo
 
 
-def _coletar_arquivos_por_nome(
-    raiz: Path, filtro: str, limite: int = 40
-) -> Tuple[List[str], bool, str | None]:
+def _coletar_arquivos_por_nomes(
+    raiz: Path, filtros: List[str], limite: int = 40
+) -> Tuple[List[Tuple[List[str], bool]], str | None]:
+    """Arquivos de cada filtro (até `limite` por filtro) com uma única passada pelo índice de nomes."""
     if not raiz.exists():
-        return [], False, f"Erro: diretório '{raiz}' não encontrado."
-    filtro_normalizado = filtro.lower().strip()
-    if not filtro_normalizado:
-        return [], False, "Erro: informe um trecho do nome do arquivo a ser buscado."
-
-    resultados: list[str] = []
-    atingiu_limite = False
-
-    # pastas que queremos ignorar em QUALQUER ponto do caminho
-    IGNORAR_DIRS = {"node_modules", "modules", ".git", "dist", "build", "__pycache__"}
+        return [], f"Erro: diretório '{raiz}' não encontrado."
+    filtros_normalizados = [filtro.lower().strip() for filtro in filtros]
+    if not all(filtros_normalizados):
+        return [], "Erro: informe um trecho do nome do arquivo a ser buscado."
 
     try:
-        for caminho in raiz.rglob("*"):
-            # se qualquer parte do caminho for uma das pastas ignoradas, pula
-            if any(part in IGNORAR_DIRS for part in caminho.parts):
-                continue
-
-            if caminho.is_file() and filtro_normalizado in caminho.name.lower():
-                resultados.append(str(caminho))
-                if len(resultados) >= limite:
-                    atingiu_limite = True
-                    break
+        return indice_nomes(raiz.resolve()).buscar_varios(filtros_normalizados, limite), None
     except PermissionError as exc:
-        return [], False, f"Erro: permissão negada ao varrer '{raiz}': {exc}"
+        return [], f"Erro: permissão negada ao varrer '{raiz}': {exc}"
+
+
+def _coletar_arquivos_por_nome(
+    raiz: Path, filtro: str, limite: int = 40
+) -> Tuple[List[str], bool, str | None]:
+    por_filtro, erro = _coletar_arquivos_por_nomes(raiz, [filtro], limite)
+    if erro:
+        return [], False, erro
+    resultados, atingiu_limite = por_filtro[0]
     return resultados, atingiu_limite, None
 
 
@@ -94,17 +123,17 @@ def _buscar_arquivos_backend_por_filtro(filtro: str, raiz: Path) -> str:
         filtros.extend(backend_hints)
         fallback_usado = True
 
+    por_filtro, erro = _coletar_arquivos_por_nomes(raiz, filtros)
+    if erro:
+        return erro
+    encontrou_principal = bool(por_filtro[0][0])
+
+    # Acertos diretos primeiro, depois os de cada dica, sem repetir arquivos.
     encontrados: list[str] = []
     vistos: set[str] = set()
     atingiu_limite_global = False
-    encontrou_principal = False
-
-    for indice, termo in enumerate(filtros):
-        parciais, atingiu_limite_local, erro = _coletar_arquivos_por_nome(raiz, termo)
-        if erro:
-            return erro
-        if indice == 0 and parciais:
-            encontrou_principal = True
+
+    for parciais, _ in por_filtro:
         for caminho in parciais:
             if caminho in vistos:
                 continue
@@ -115,9 +144,6 @@ def _buscar_arquivos_backend_por_filtro(filtro: str, raiz: Path) -> str:
                 break
         if atingiu_limite_global:
             break
-        if atingiu_limite_local and len(encontrados) >= 40:
-            atingiu_limite_global = True
-            break
 
     if not encontrados:
         return f"Nenhum arquivo contendo '{filtro}' foi encontrado em {raiz}."
@@ -134,7 +160,8 @@ def _buscar_arquivos_backend_por_filtro(filtro: str, raiz: Path) -> str:
     return resposta
 
 
-def buscar_arquivos(projeto: str, filtro: str) -> str:
+def _resolver_raiz_projeto(projeto: str) -> Tuple[str, Path | None, str | None]:
+    """Chave e diretório do projeto pedido, ou a mensagem de erro para o agente."""
     projeto_resolvido = resolver_projeto_busca(projeto)
     if not projeto_resolvido:
         opcoes = ", ".join(
@@ -146,20 +173,55 @@ def buscar_arquivos(projeto: str, filtro: str) -> str:
                 }
             )
         )
-        return (
+        return "", None, (
             "Erro: projeto não reconhecido. Informe um dos seguintes nomes ou aliases: "
             f"{opcoes}."
         )
 
     raiz = config.PROJECT_PATHS.get(projeto_resolvido)
     if not raiz:
-        return f"Erro: o diretório do projeto '{projeto_resolvido}' não está configurado."
+        return (
+            projeto_resolvido,
+            None,
+            f"Erro: o diretório do projeto '{projeto_resolvido}' não está configurado.",
+        )
+    return projeto_resolvido, raiz, None
+
+
+def buscar_arquivos(projeto: str, filtro: str) -> str:
+    projeto_resolvido, raiz, erro = _resolver_raiz_projeto(projeto)
+    if erro:
+        return erro
 
     if eh_backend(projeto_resolvido):
         return _buscar_arquivos_backend_por_filtro(filtro, raiz)
 
     return _buscar_arquivos_em_diretorio(raiz, filtro)
 
+
+def buscar_conteudo(projeto: str, texto: str) -> str:
+    """Procura `texto` no conteúdo dos arquivos do projeto e lista as linhas encontradas."""
+    projeto_resolvido, raiz, erro = _resolver_raiz_projeto(projeto)
+    if erro:
+        return erro
+    if not raiz.exists():
+        return f"Erro: diretório '{raiz}' não encontrado."
+    if not texto or not texto.strip():
+        return "Erro: informe o texto a ser buscado."
+
+    limite = config.CONTENT_SEARCH_MAX_RESULTS
+    try:
+        indice = indice_conteudo(projeto_resolvido, raiz.resolve())
+        resultados, atingiu_limite = indice.buscar(texto.strip(), limite)
+    except PermissionError as exc:
+        return f"Erro: permissão negada ao varrer '{raiz}': {exc}"
+    if not resultados:
+        return f"Nenhuma ocorrência de '{texto.strip()}' foi encontrada em {raiz}."
+    resposta = "\n".join(resultados)
+    if atingiu_limite:
+        resposta += f"\n... (limite de {limite} resultados atingido; refine o texto buscado)"
+    return resposta
+
 def _slugify_nome(nome: str) -> str:
     """Gera um slug simples, só com letras/números/minusculas e hífen."""
     if not nome:
@@ -0,0 +1,172 @@
+"""Rastreamento estruturado das execuções do agente, gravado fora do caminho crítico.
+
+Os eventos (chamadas ao LLM, tools, iterações, respostas do servidor) viram
+registros do logger `agente.rastreamento`. Quem gera o evento apenas coloca o
+registro em uma fila; uma thread do `QueueListener` grava o JSON no arquivo e,
+se `tracing.console` estiver ligado, exibe a visão detalhada no terminal.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import queue
+import random
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, get_buffer_string
+
+from . import config
+
+NIVEIS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "OFF": logging.CRITICAL + 1,
+}
+
+logger = logging.getLogger("agente.rastreamento")
+logger.propagate = False
+
+_INICIADO = False
+
+
+def _resumir(valor: Any, limite: int) -> str:
+    texto = valor if isinstance(valor, str) else str(getattr(valor, "content", valor))
+    if len(texto) <= limite:
+        return texto
+    return f"{texto[:limite]}[... +{len(texto) - limite} caracteres]"
+
+
+class _FormatoJson(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            {
+                "data": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                "nivel": record.levelname,
+                "evento": record.getMessage(),
+                **getattr(record, "dados", {}),
+            },
+            ensure_ascii=False,
+            default=str,
+        )
+
+
+class _FormatoConsole(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados = getattr(record, "dados", {})
+        linhas = [f"[Rastreamento] {record.getMessage()}" + "".join(
+            f" {chave}={valor}" for chave, valor in dados.items() if chave != "conteudo"
+        )]
+        if dados.get("conteudo"):
+            linhas.append(str(dados["conteudo"]))
+            linhas.append("-" * 40)
+        return "\n".join(linhas)
+
+
+def iniciar_rastreamento() -> None:
+    """Configura o logger e a thread de gravação uma única vez por processo."""
+    global _INICIADO
+    if _INICIADO:
+        return
+    _INICIADO = True
+    logger.setLevel(NIVEIS[config.TRACING_LEVEL])
+    if config.TRACING_LEVEL == "OFF":
+        logger.disabled = True
+        return
+    config.TRACING_FILE.parent.mkdir(parents=True, exist_ok=True)
+    arquivo = logging.FileHandler(config.TRACING_FILE, encoding="utf-8")
+    arquivo.setFormatter(_FormatoJson())
+    destinos: list[logging.Handler] = [arquivo]
+    if config.TRACING_CONSOLE:
+        console = logging.StreamHandler()
+        console.setFormatter(_FormatoConsole())
+        destinos.append(console)
+    fila: queue.SimpleQueue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(fila))
+    ouvinte = QueueListener(fila, *destinos)
+    ouvinte.start()
+    atexit.register(ouvinte.stop)
+
+
+def registrar_evento(nivel: int, evento: str, **dados: Any) -> None:
+    if logger.isEnabledFor(nivel):
+        logger.log(nivel, evento, extra={"dados": dados})
+
+
+class RastreadorExecucao(BaseCallbackHandler):
+    """Callback que transforma a execução de um turno em eventos de rastreamento.
+
+    Prompts, respostas e saídas das tools só são montados no nível DEBUG e são
+    truncados em `tracing.maxPayloadCharacters`. A amostragem é decidida por
+    turno (`tracing.sampleRate`); erros são sempre registrados.
+    """
+
+    def __init__(self, turno: str | None = None) -> None:
+        iniciar_rastreamento()
+        self.turno = turno
+        self.amostrado = random.random() < config.TRACING_SAMPLE_RATE
+        self.limite = config.TRACING_MAX_PAYLOAD_CHARACTERS
+
+    def _registrar(self, nivel: int, evento: str, **dados: Any) -> None:
+        if nivel < logging.WARNING and not self.amostrado:
+            return
+        registrar_evento(nivel, evento, turno=self.turno, **dados)
+
+    def _detalhado(self) -> bool:
+        return self.amostrado and logger.isEnabledFor(logging.DEBUG)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[BaseMessage]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        dados: dict[str, Any] = {"execucao": str(run_id), "no": (metadata or {}).get("langgraph_node")}
+        if self._detalhado():
+            dados["conteudo"] = _resumir("\n\n".join(get_buffer_string(lote) for lote in messages), self.limite)
+        self._registrar(logging.INFO, "llm_inicio", **dados)
+
+    def on_llm_start(self, serialized: dict[str, Any], prompts: list[str], *, run_id: UUID, **kwargs: Any) -> None:
+        dados: dict[str, Any] = {"execucao": str(run_id)}
+        if self._detalhado():
+            dados["conteudo"] = _resumir("\n\n".join(prompts), self.limite)
+        self._registrar(logging.INFO, "llm_inicio", **dados)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        dados: dict[str, Any] = {"execucao": str(run_id)}
+        if self._detalhado():
+            dados["conteudo"] = _resumir(
+                "\n".join(geracoes[0].text for geracoes in response.generations if geracoes), self.limite
+            )
+        self._registrar(logging.INFO, "llm_fim", **dados)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._registrar(logging.ERROR, "llm_erro", execucao=str(run_id), erro=_resumir(str(error), self.limite))
+
+    def on_tool_start(self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        dados: dict[str, Any] = {"execucao": str(run_id), "tool": serialized.get("name", "ferramenta")}
+        if self._detalhado():
+            dados["conteudo"] = _resumir(input_str, self.limite)
+        self._registrar(logging.INFO, "tool_inicio", **dados)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        dados: dict[str, Any] = {"execucao": str(run_id)}
+        if self._detalhado():
+            dados["conteudo"] = _resumir(output, self.limite)
+        self._registrar(logging.INFO, "tool_fim", **dados)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._registrar(logging.ERROR, "tool_erro", execucao=str(run_id), erro=_resumir(str(error), self.limite))
+
+    def evento(self, nivel: int, evento: str, **dados: Any) -> None:
+        """Eventos do próprio agente (iterações, decisão de parada) no mesmo turno amostrado."""
+        self._registrar(nivel, evento, **dados)
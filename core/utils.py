@@ -1,11 +1,13 @@
 from datetime import datetime
 from pathlib import Path
-from typing import Tuple
+from typing import Callable, Tuple
 
 from . import config
 
 CONTEXT_ALIAS_MAP: dict[str, str] = {}
 PROJECT_ALIAS_MAP: dict[str, str] = {}
+# Funções notificadas a cada arquivo alterado pelo agente (ex.: indexação em segundo plano).
+OUVINTES_ALTERACAO: list[Callable[[Path], None]] = []
 
 
 def _normalizar_identificador(valor: str) -> str:
@@ -93,6 +95,8 @@ def formatar_listas_alteracoes(arquivos: list[str]) -> str:
 
 def registrar_alteracao(caminho: Path) -> None:
     config.ALTERACOES_ATUAIS.add(str(caminho))
+    for ouvinte in OUVINTES_ALTERACAO:
+        ouvinte(Path(caminho))
 
 
 def anexar_registro_tasks(pergunta: str, resposta: str) -> None:
@@ -1,52 +1,69 @@
 """Script de ingestão de documentos para o agente RAG."""
 from __future__ import annotations
 
-import os
-from pathlib import Path
+import argparse
 
-from dotenv import load_dotenv
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_core.documents import Document
-
-
-BASE_DIR = Path(__file__).resolve().parent
-DOCS_DIR = BASE_DIR / "docs"
-DB_DIR = BASE_DIR / ".rag_db"
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 150
-
-
-def load_documents() -> list[Document]:
-    documents: list[Document] = []
-    for file_path in DOCS_DIR.rglob("*"):
-        if not file_path.is_file():
-            continue
-        text = file_path.read_text(encoding="utf-8")
-        metadata = {"source": str(file_path.relative_to(BASE_DIR))}
-        enriched_text = f"Fonte: {metadata['source']}\n\n{text}"
-        documents.append(Document(page_content=enriched_text, metadata=metadata))
-    return documents
+from core import config
+from core.ingestion import executar_ingestao
+from core.tracing import iniciar_rastreamento
 
 
 def main() -> None:
-    load_dotenv(BASE_DIR / ".env")
-    if not DOCS_DIR.exists():
-        raise FileNotFoundError("Pasta docs/ não encontrada. Crie-a antes de executar a ingestão.")
-
-    raw_documents = load_documents()
-    if not raw_documents:
-        raise RuntimeError("Nenhum documento encontrado na pasta docs/. Adicione arquivos e tente novamente.")
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    chunks = splitter.split_documents(raw_documents)
-
-    embeddings = OpenAIEmbeddings()
-    DB_DIR.mkdir(exist_ok=True)
-    Chroma.from_documents(chunks, embedding=embeddings, persist_directory=str(DB_DIR))
+    parser = argparse.ArgumentParser(
+        description="Indexa a pasta docs/ (e, opcionalmente, o código dos projetos) na base vetorial do agente."
+    )
+    parser.add_argument(
+        "--completa",
+        action="store_true",
+        help="Recria do zero os escopos selecionados (docs/ e/ou --projetos); os demais ficam intactos.",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=None,
+        help=f"Chunks por requisição de embeddings (padrão: {config.INGESTION_BATCH_SIZE}).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=f"Lotes processados em paralelo (padrão: {config.INGESTION_MAX_WORKERS}).",
+    )
+    parser.add_argument(
+        "--projetos",
+        nargs="*",
+        metavar="PROJETO",
+        default=None,
+        help=(
+            "Indexa também o código dos projetos de projectDirs "
+            f"({', '.join(sorted(config.PROJECT_PATHS))}); sem nomes, indexa todos."
+        ),
+    )
+    parser.add_argument(
+        "--sem-docs",
+        action="store_true",
+        help="Não sincroniza a pasta docs/ nesta execução (útil junto com --projetos).",
+    )
+    parser.add_argument(
+        "--processos",
+        type=int,
+        default=None,
+        help=f"Processos para leitura/divisão do código (padrão: {config.INGESTION_PROCESS_WORKERS}).",
+    )
+    args = parser.parse_args()
+    # Novas tentativas da API de embeddings vão para o rastreamento (tracing.file/console).
+    iniciar_rastreamento()
 
-    print(f"Ingestão concluída. Documentos processados: {len(chunks)}")
+    relatorio = executar_ingestao(
+        completa=args.completa,
+        tamanho_lote=args.lote,
+        max_workers=args.workers,
+        projetos=args.projetos,
+        incluir_docs=not args.sem_docs,
+        processos=args.processos,
+    )
+    print(relatorio.formatar())
+    print(f"Base vetorial: {config.DB_DIR}")
 
 
 if __name__ == "__main__":
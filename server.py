@@ -1,20 +1,65 @@
+import asyncio
+import json
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from time import time
 from typing import List, Optional
+from uuid import uuid4
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
 import agent  # seu agent.py
+from core import config
+from core.admission import ControleAdmissao, Saturado, Vaga
+from core.live_index import iniciar_indexacao_em_segundo_plano
+from core.sessions import abrir_checkpointer, config_sessao
+from core.streaming import TextoTransmitido
+from core.tracing import logger, registrar_evento
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # mantém a base vetorial atualizada com o que o agente escreve durante a sessão
+    indexador = iniciar_indexacao_em_segundo_plano()
+    yield
+    if indexador is not None:
+        indexador.parar()
+    executor.shutdown(wait=False, cancel_futures=True)
+
 
 app = FastAPI(
     title="Agente Certidão ",
     description="Servidor OpenAI-compatible para o agente RAG (LangChain + LangGraph).",
+    lifespan=lifespan,
+)
+
+# Um único grafo atende todas as sessões: o estado de cada uma (histórico,
+# resumo, contexto) fica no checkpointer, separado pelo thread_id.
+checkpointer = abrir_checkpointer()
+lc_agent = agent.build_agent(checkpointer)
+
+# Turnos rodam em um pool limitado de threads, fora do event loop; um turno por
+# sessão de cada vez, para que duas requisições não disputem o mesmo histórico.
+executor = ThreadPoolExecutor(
+    max_workers=config.SERVER_MAX_CONCURRENT_TURNS, thread_name_prefix="agente-turno"
 )
+_travas_sessao: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
 
-# estado global simples, igual ao main do agent
-rag_history: list[tuple[str, str]] = []
-lc_agent = agent.build_agent(rag_history)  # ou build_graph_agent, se esse for o nome aí
+CABECALHO_SESSAO = "X-Session-Id"
+
+# Turnos além de maxConcurrentTurns esperam em uma fila limitada, com rodízio
+# entre clientes; acima dos limites a resposta é 429/503 com Retry-After.
+controle = ControleAdmissao(
+    max_em_execucao=config.SERVER_MAX_CONCURRENT_TURNS,
+    max_fila=config.SERVER_MAX_QUEUED_TURNS,
+    max_por_cliente=config.SERVER_MAX_TURNS_PER_CLIENT,
+    espera_maxima=config.SERVER_MAX_QUEUE_WAIT_SECONDS,
+)
 
 
 class ChatMessage(BaseModel):
@@ -25,31 +70,209 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     model: Optional[str] = None
     messages: List[ChatMessage]
+    stream: bool = False
+    user: Optional[str] = None
 
 
-@app.post("/v1/chat/completions")
-def chat(req: ChatRequest):
-    user_msg = req.messages[-1].content
+@app.exception_handler(Saturado)
+async def _recusar_turno(_: Request, exc: Saturado) -> JSONResponse:
+    tipo = "rate_limit_exceeded" if exc.status == 429 else "server_overloaded"
+    return JSONResponse(
+        status_code=exc.status,
+        content={"error": {"message": exc.motivo, "type": tipo}},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def _admitir(cliente: str) -> Vaga:
+    vaga = await controle.entrar(cliente)
+    registrar_evento(logging.INFO, "admissao", cliente=cliente, espera_ms=round(vaga.espera * 1000))
+    return vaga
+
+
+@app.get("/status/fila")
+def status_fila():
+    return controle.estatisticas()
+
+
+def _trava_sessao(sessao: str) -> asyncio.Lock:
+    trava = _travas_sessao.get(sessao)
+    if trava is None:
+        trava = asyncio.Lock()
+        _travas_sessao[sessao] = trava
+    return trava
+
+
+async def _iniciar_turno(cliente: str, sessao: str, funcao, *args) -> asyncio.Future:
+    """Inicia o turno no pool de threads com a sessão travada.
+
+    A vaga da admissão só é pedida depois de obtida a trava da sessão: requisições
+    enfileiradas atrás de outro turno da mesma sessão não ocupam vagas sem
+    trabalhar. Trava e vaga são liberadas por callback quando a thread termina,
+    e não por quem aguarda o resultado: se o cliente desconectar, o Starlette
+    cancela a requisição, mas a sessão continua travada e a vaga ocupada até o
+    turno acabar.
+    """
+    trava = _trava_sessao(sessao)
+    await trava.acquire()
+    try:
+        vaga = await _admitir(cliente)
+    except BaseException:
+        trava.release()
+        raise
+    try:
+        futuro = asyncio.get_running_loop().run_in_executor(executor, funcao, *args)
+    except BaseException:
+        trava.release()
+        controle.sair(vaga)
+        raise
+
+    def liberar(_: asyncio.Future) -> None:
+        trava.release()
+        controle.sair(vaga)
+
+    futuro.add_done_callback(liberar)
+    return futuro
+
+
+def _identificar_sessao(req: ChatRequest, cabecalho: Optional[str]) -> tuple[str, bool]:
+    """Sessão pelo cabeçalho X-Session-Id ou pelo campo `user`; sem nenhum, o turno é avulso."""
+    sessao = cabecalho or req.user
+    if sessao:
+        return sessao, False
+    return f"avulsa-{uuid4().hex}", True
+
 
-    print("[Agente] Consultando LLM...")
-    resultado = lc_agent.invoke({"input": user_msg})
-    print("[Agente] LLM respondeu.")
+def _executar_turno(user_msg: str, sessao: str, avulsa: bool, ao_evento=None):
+    configurable = {"ao_evento": ao_evento} if ao_evento is not None else {}
+    try:
+        return lc_agent.invoke(
+            {"input": user_msg, "answer": ""},
+            config={"recursion_limit": 100, **config_sessao(sessao, **configurable)},
+        )
+    finally:
+        if avulsa and checkpointer is not None:
+            checkpointer.delete_thread(sessao)
 
+
+def _extrair_resposta(resultado) -> str:
     # Extrair a resposta de forma segura
     if isinstance(resultado, dict):
         if "output" in resultado:
-            answer = resultado["output"]
-        elif "answer" in resultado:
-            answer = resultado["answer"]
-        elif "result" in resultado:
-            answer = resultado["result"]
+            return resultado["output"]
+        if "answer" in resultado:
+            return resultado["answer"]
+        if "result" in resultado:
+            return resultado["result"]
+    return str(resultado)
+
+
+def _uso_tokens(resultado) -> dict:
+    metricas = resultado.get("metricas") if isinstance(resultado, dict) else None
+    tokens = (metricas or {}).get("tokens") or {}
+    return {
+        "prompt_tokens": tokens.get("entrada", 0),
+        "completion_tokens": tokens.get("saida", 0),
+        "total_tokens": tokens.get("total", 0),
+        "prompt_tokens_details": {"cached_tokens": tokens.get("em_cache", 0)},
+    }
+
+
+STATUS_TOOL = {"tool_inicio": "started", "tool_fim": "finished", "tool_erro": "error"}
+
+
+def _chunk_sse(chunk_id: str, created: int, model: str, delta: dict, finish_reason=None, **extras) -> str:
+    chunk = {
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        **extras,
+    }
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+
+async def _transmitir(user_msg: str, model: str, sessao: str, avulsa: bool, cliente: str):
+    """Executa o turno no pool de threads e repassa tokens e progresso das tools como SSE."""
+    loop = asyncio.get_running_loop()
+    eventos: asyncio.Queue = asyncio.Queue()
+    fim = object()
+    resultado: dict = {}
+
+    def publicar(evento) -> None:
+        loop.call_soon_threadsafe(eventos.put_nowait, evento)
+
+    def executar() -> None:
+        try:
+            resultado["estado"] = _executar_turno(user_msg, sessao, avulsa, publicar)
+        except Exception as exc:  # noqa: BLE001
+            resultado["erro"] = exc
+        finally:
+            publicar(fim)
+
+    now = int(time())
+    chunk_id = f"chatcmpl-local-{now}"
+    transmitido = TextoTransmitido()
+    await _iniciar_turno(cliente, sessao, executar)
+    yield _chunk_sse(chunk_id, now, model, {"role": "assistant", "content": ""})
+    while (evento := await eventos.get()) is not fim:
+        if evento["tipo"] == "token":
+            if transmitido.execucao not in (None, evento["execucao"]):
+                # nova resposta do agente após uma rodada de tools
+                yield _chunk_sse(chunk_id, now, model, {"content": "\n\n"})
+            transmitido.registrar(evento)
+            yield _chunk_sse(chunk_id, now, model, {"content": evento["conteudo"]})
         else:
-            answer = str(resultado)
+            progresso = {"name": evento["nome"], "status": STATUS_TOOL[evento["tipo"]]}
+            if "erro" in evento:
+                progresso["error"] = evento["erro"]
+            yield _chunk_sse(chunk_id, now, model, {}, tool_progress=progresso)
+
+    if "erro" in resultado:
+        answer = f"Erro ao executar o agente: {resultado['erro']}"
     else:
-        answer = str(resultado)
+        answer = _extrair_resposta(resultado["estado"])
+    restante = transmitido.restante(answer)
+    if restante is None:
+        restante = f"\n\n{answer}" if transmitido.texto else answer
+    if restante:
+        yield _chunk_sse(chunk_id, now, model, {"content": restante})
+    yield _chunk_sse(
+        chunk_id, now, model, {}, finish_reason="stop", usage=_uso_tokens(resultado.get("estado"))
+    )
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat(
+    req: ChatRequest,
+    request: Request,
+    x_session_id: Optional[str] = Header(default=None, alias=CABECALHO_SESSAO),
+):
+    user_msg = req.messages[-1].content
+    sessao, avulsa = _identificar_sessao(req, x_session_id)
+    cliente = x_session_id or req.user or (request.client.host if request.client else "desconhecido")
+
+    if req.stream:
+        fluxo = _transmitir(user_msg, req.model or "local-agent", sessao, avulsa, cliente)
+        # O primeiro chunk só sai com o turno já admitido e em execução (uma recusa
+        # da admissão vira 429/503 aqui); a partir daí a vaga é liberada quando a
+        # thread do turno termina, mesmo que o cliente desconecte.
+        primeiro = await anext(fluxo)
+
+        async def continuar():
+            yield primeiro
+            async for chunk in fluxo:
+                yield chunk
+
+        return StreamingResponse(continuar(), media_type="text/event-stream")
+
+    futuro = await _iniciar_turno(cliente, sessao, _executar_turno, user_msg, sessao, avulsa)
+    # shield: um cancelamento da requisição não marca o turno como terminado.
+    resultado = await asyncio.shield(futuro)
 
-    # Atualiza histórico usado pelo seu agente (se fizer sentido)
-    rag_history.append((user_msg, answer))
+    answer = _extrair_resposta(resultado)
 
     # Monta resposta no formato OpenAI
     now = int(time())
@@ -68,14 +291,15 @@ def chat(req: ChatRequest):
                 "finish_reason": "stop",
             }
         ],
-        "usage": {
-            "prompt_tokens": 0,
-            "completion_tokens": 0,
-            "total_tokens": 0,
-        },
+        "usage": _uso_tokens(resultado),
     }
 
-    print("DEBUG payload enviado para o Continue:", payload)
+    if logger.isEnabledFor(logging.DEBUG):
+        registrar_evento(
+            logging.DEBUG,
+            "resposta_servidor",
+            conteudo=json.dumps(payload, ensure_ascii=False)[: config.TRACING_MAX_PAYLOAD_CHARACTERS],
+        )
     return payload
 
 
@@ -0,0 +1,23 @@
+"""Os testes usam o `agent_config.example.json`, sem depender do config local."""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def _config_de_teste() -> Path:
+    dados = json.loads((RAIZ / "config" / "agent_config.example.json").read_text(encoding="utf-8"))
+    dados["systemPromptBlockFiles"] = {
+        chave: str(RAIZ / "config" / "system_prompt_blocks_example" / Path(caminho).name)
+        for chave, caminho in dados.get("systemPromptBlockFiles", {}).items()
+    }
+    caminho = Path(tempfile.mkdtemp()) / "agent_config.json"
+    caminho.write_text(json.dumps(dados), encoding="utf-8")
+    return caminho
+
+
+os.environ.setdefault("AGENT_CONFIG_PATH", str(_config_de_teste()))
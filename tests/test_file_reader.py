@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import pytest
+
+from core.file_reader import LeituraInvalidaError, ler_trecho
+
+
+@pytest.mark.parametrize("linha_inicial", [0, -1])
+def test_linha_inicial_menor_que_um_e_recusada(tmp_path, linha_inicial):
+    arquivo = tmp_path / "a.txt"
+    arquivo.write_text("um\ndois\n", encoding="utf-8")
+
+    with pytest.raises(LeituraInvalidaError, match="a primeira linha é 1"):
+        ler_trecho(arquivo, 1024, linha_inicial=linha_inicial)
+
+
+def test_linha_inicial_um_le_do_inicio(tmp_path):
+    arquivo = tmp_path / "a.txt"
+    arquivo.write_text("um\ndois\n", encoding="utf-8")
+
+    trecho = ler_trecho(arquivo, 1024, linha_inicial=1, quantidade_linhas=1)
+
+    assert (trecho.texto, trecho.linha_inicial, trecho.linha_final) == ("um\n", 1, 1)
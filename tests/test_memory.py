@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from core.memory import MARCA_TRUNCADO, MemoriaConversa, contar_tokens
+
+MODELO = "gpt-4o-mini"
+
+
+def _memoria(max_tokens: int, turnos_recentes: int) -> MemoriaConversa:
+    return MemoriaConversa(
+        FakeListChatModel(responses=["resumo novo"]),
+        MODELO,
+        max_tokens=max_tokens,
+        turnos_recentes=turnos_recentes,
+        max_tokens_resumo=100,
+    )
+
+
+def test_turno_recente_acima_do_orcamento_e_truncado():
+    historico = [HumanMessage("leia o controller"), AIMessage("linha de código\n" * 2000)]
+    memoria = _memoria(max_tokens=500, turnos_recentes=2)
+
+    restante, resumo = memoria.compactar(historico, "resumo antigo")
+
+    assert contar_tokens(restante, MODELO) <= 500
+    assert restante[0].text == "leia o controller"
+    assert restante[1].text.endswith(MARCA_TRUNCADO)
+    assert resumo == "resumo antigo"  # nada foi resumido: só havia um turno
+
+
+def test_turnos_recentes_acima_do_orcamento_vao_para_o_resumo():
+    turno_longo = [HumanMessage("primeira pergunta"), AIMessage("resposta longa " * 400)]
+    turno_curto = [HumanMessage("segunda pergunta"), AIMessage("ok")]
+    memoria = _memoria(max_tokens=200, turnos_recentes=2)
+
+    restante, resumo = memoria.compactar(turno_longo + turno_curto, None)
+
+    assert restante == turno_curto
+    assert resumo == "resumo novo"
+
+
+def test_historico_dentro_do_orcamento_nao_muda():
+    historico = [HumanMessage("oi"), AIMessage("olá")]
+    memoria = _memoria(max_tokens=500, turnos_recentes=2)
+
+    assert memoria.compactar(historico, None) == (historico, None)